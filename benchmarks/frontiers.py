@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# Push / pop throughput for each of the search frontiers, with queue.PriorityQueue (what
+# AStar used to use) for comparison. Priorities are small integers, as they are in the
+# search. Run from the top level directory: python3 benchmarks/frontiers.py
+
+import sys
+sys.path.append('./')
+
+import random
+import time
+from itertools import count
+from queue import PriorityQueue
+from trix.search import Frontiers
+
+class LockedFrontier(object):
+  "queue.PriorityQueue behind the frontier interface."
+
+  def __init__(self):
+    self.queue   = PriorityQueue()
+    self.counter = count()
+
+  def push(self, priority, node):
+    self.queue.put((priority, next(self.counter), node))
+
+  def pop(self):
+    if self.queue.empty(): return None
+    return self.queue.get(False)[2]
+
+  def __len__(self):
+    return self.queue.qsize()
+
+def run(frontier_class, priorities):
+  frontier = frontier_class()
+  node     = object()
+  started  = time.perf_counter()
+  # Interleave pushes and pops the way the search does: a pop, then a batch of children.
+  for index, priority in enumerate(priorities):
+    frontier.push(priority, node)
+    if index % 4 == 3: frontier.pop()
+  while frontier.pop() is not None: pass
+  return time.perf_counter() - started
+
+def main(operations=200000, repeats=3):
+  generator  = random.Random(4211)
+  priorities = [generator.randint(-4, 30) for _ in range(operations)]
+  candidates = [('priority_queue', LockedFrontier)] + sorted(Frontiers.items())
+  for name, frontier_class in candidates:
+    elapsed = min(run(frontier_class, priorities) for _ in range(repeats))
+    # Every item is pushed once and popped once.
+    print("%-16s %10.0f ops/s" % (name, (2 * operations) / elapsed))
+
+if __name__ == '__main__': main()
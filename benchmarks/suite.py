@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# The benchmark suite. Times the operations the search spends its time on, then plays
+# whole games - every data/in.* file plus synthetic sequences of random pieces - reporting
+# the time, nodes visited per second, peak memory and final board of each, as JSON.
+#
+# Given a baseline (the JSON from an earlier run), it also compares against it and exits
+# with a failure when anything got worse by more than the threshold. It needs Python 3.11
+# or later, for max_tasks_per_child. Run from the top level directory:
+#
+#   python3 benchmarks/suite.py --output baseline.json
+#   python3 benchmarks/suite.py --baseline baseline.json --threshold 0.2
+
+import sys
+sys.path.append('./')
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from trix.config import defaults, Configuration
+from trix.environment import Row, Board, Environment
+from trix.game import Pieces, placements_for
+from trix.utilities import Referee, Variation
+from trix.agent import MinimalSearchAgent, MinimalSearchNode, Tracker
+from trix.search import AStar
+from trix import runner
+
+parser = argparse.ArgumentParser(description="Benchmarks trix")
+parser.add_argument('--agents', help='The agents to play each game with, comma separated', default='default,beam')
+parser.add_argument('--buffers', help='The buffer sizes to play each game with, comma separated', default='1,3')
+parser.add_argument('--synthetic', help='The lengths of the random piece sequences to play, comma separated', default='500')
+parser.add_argument('--repeats', help='How many times to time each operation, keeping the best', default=5, type=int)
+parser.add_argument('--micro-only', help='Skip the games', action='store_true')
+parser.add_argument('--output', help='The file to write the results to, as well as printing them')
+parser.add_argument('--baseline', help='Results from an earlier run to compare against')
+parser.add_argument('--threshold', help='The largest relative change for the worse that is not a regression', default=0.2, type=float)
+
+def configuration(**entries):
+  result = Configuration()
+  result.merge(defaults)
+  result.__dict__.update(entries)
+  return result
+
+# Microbenchmarks. Each setup function returns the operation to time, which is run against
+# a board partway through a game so the rows and skyline are realistic.
+
+def midgame_board(placements=40):
+  generator = random.Random(4211)
+  tables    = placements_for(defaults.width)
+  board     = Board(defaults.width, tiles=False)
+  for _ in range(placements):
+    action = generator.choice(tables.place_next[generator.choice(sorted(Pieces))])
+    board.place(action.piece, action.left_offset)
+  return board
+
+def midgame_environment(buffer=2):
+  generator   = random.Random(4211)
+  pieces      = [Pieces[generator.choice(sorted(Pieces))] for _ in range(200)]
+  environment = Environment(configuration(buffer=buffer), pieces)
+  environment.board = midgame_board()
+  return environment
+
+def row_can_place():
+  row = Row(defaults.width)
+  row.place(Pieces['2'], 0, 0)
+  piece = Pieces['3']
+  return lambda: row.can_place(piece, 1, 4)
+
+def board_place():
+  board  = midgame_board()
+  action = placements_for(defaults.width).place_next['6'][3]
+  def operation():
+    copy = board.copy(tiles=False)
+    copy.place(action.piece, action.left_offset)
+  return operation
+
+def board_copy():
+  board = midgame_board()
+  return lambda: board.copy(tiles=False)
+
+def environment_fork():
+  environment = midgame_environment()
+  action      = next(iter(placements_for(defaults.width).place_next[environment.items[0].name]))
+  return lambda: environment.fork(action)
+
+def referee_calculate():
+  # Uncached, as the cache would otherwise answer every call after the first.
+  board = midgame_board()
+  return lambda: Referee.uncached(board)
+
+def astar_search():
+  environment = midgame_environment()
+  agent       = MinimalSearchAgent(environment)
+  def operation():
+    root = MinimalSearchNode(Variation(environment, -1, []), None, Tracker({}, 4), 0, root_node=True)
+    if agent.table is not None: agent.table.clear()
+    AStar(root, agent.table, agent.frontier).search()
+  return operation
+
+Micro = [row_can_place, board_place, board_copy, environment_fork, referee_calculate, astar_search]
+
+def time_operation(operation, repeats, budget=0.2):
+  # Work out how many calls take around the budget, then keep the best of the repeats.
+  calls   = 1
+  while True:
+    started = time.perf_counter()
+    for _ in range(calls): operation()
+    elapsed = time.perf_counter() - started
+    if elapsed >= budget / 10 or calls >= 1 << 20: break
+    calls *= 10
+  best = elapsed / calls
+  for _ in range(repeats):
+    started = time.perf_counter()
+    for _ in range(calls): operation()
+    best = min(best, (time.perf_counter() - started) / calls)
+  return {'seconds': best, 'ops_per_second': 1 / best}
+
+def micro(repeats):
+  return {setup.__name__: time_operation(setup(), repeats) for setup in Micro}
+
+# End to end games, each played in a fresh process so its peak memory is its own. They
+# are forked from a forkserver: a process started with exec (as with spawn) keeps the
+# high water mark of the one that started it, so ru_maxrss would include ours.
+
+def synthetic_sequence(length, directory):
+  generator = random.Random(length)
+  path      = os.path.join(directory, "synthetic-%d" % length)
+  with open(path, 'w') as f:
+    f.write("".join(generator.choice(sorted(Pieces)) for _ in range(length)) + "\n")
+  return path
+
+def play(input_file, agent, buffer, output_file):
+  started = time.perf_counter()
+  player  = runner.play(configuration(agent=agent, buffer=buffer, input_file=input_file, output_file=output_file))
+  elapsed = time.perf_counter() - started
+  board   = player.environment.board
+  return {
+    'seconds':          elapsed,
+    'nodes':            player.visited,
+    'nodes_per_second': player.visited / elapsed if elapsed else 0.0,
+    # ru_maxrss is in kilobytes on Linux (and bytes on macOS).
+    'peak_memory':      resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'height':           board.height(),
+    'max_height':       board.maximum_height,
+    'holes':            board.holes,
+    'cleared':          board.cleared
+  }
+
+def games(agents, buffers, lengths):
+  results = {}
+  with tempfile.TemporaryDirectory() as directory:
+    inputs = sorted(glob.glob('data/in.*')) + [synthetic_sequence(length, directory) for length in lengths]
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('forkserver'), max_tasks_per_child=1) as pool:
+      for input_file in inputs:
+        for agent in agents:
+          for buffer in buffers:
+            name   = "%s/%s/b%d" % (os.path.basename(input_file), agent, buffer)
+            output = os.path.join(directory, name.replace('/', '.'))
+            results[name] = pool.submit(play, input_file, agent, buffer, output).result()
+  return results
+
+# Comparing against a baseline. Each metric is either better higher or better lower.
+
+Higher = {'ops_per_second', 'nodes_per_second', 'cleared'}
+Lower  = {'seconds', 'peak_memory', 'height', 'max_height', 'holes'}
+
+def regressions(results, baseline, threshold):
+  found = []
+  for section in ('micro', 'games'):
+    for name, metrics in baseline.get(section, {}).items():
+      current = results.get(section, {}).get(name)
+      if current is None: continue
+      for metric, before in metrics.items():
+        after = current.get(metric)
+        if after is None or metric not in Higher | Lower: continue
+        if metric in Higher: change = (before - after) / before if before else 0.0
+        else:                change = (after - before) / before if before else float(after > 0)
+        if change > threshold:
+          found.append("%s %s %s: %.4g -> %.4g (%.0f%% worse)" % (section, name, metric, before, after, change * 100))
+  return found
+
+def main(argv):
+  arguments = parser.parse_args(argv[1:])
+  results   = {'python': platform.python_version(), 'micro': micro(arguments.repeats)}
+  if not arguments.micro_only:
+    agents  = arguments.agents.split(',')
+    buffers = [int(buffer) for buffer in arguments.buffers.split(',')]
+    lengths = [int(length) for length in arguments.synthetic.split(',') if length]
+    results['games'] = games(agents, buffers, lengths)
+  report = json.dumps(results, indent=2, sort_keys=True)
+  print(report)
+  if arguments.output:
+    with open(arguments.output, 'w') as f: print(report, file=f)
+  if arguments.baseline:
+    with open(arguments.baseline) as f: baseline = json.load(f)
+    found = regressions(results, baseline, arguments.threshold)
+    for regression in found: print("Regression: " + regression, file=sys.stderr)
+    if found: return 1
+  return 0
+
+if __name__ == '__main__': sys.exit(main(sys.argv))
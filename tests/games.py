@@ -0,0 +1,21 @@
+import trix.config
+from trix.environment import Environment
+from trix.game import Pieces
+
+class GameSetup(object):
+  """
+  Mixed into the test cases that play games: a configuration from the defaults, with the
+  width and buffer set by the class, and environments for sequences of pieces by name.
+  """
+
+  width  = 5
+  buffer = 1
+
+  def setUp(self):
+    self.config = trix.config.Configuration()
+    self.config.merge(trix.config.defaults)
+    self.config.width  = self.width
+    self.config.buffer = self.buffer
+
+  def environment_for(self, names):
+    return Environment(self.config, [Pieces[name] for name in names])
@@ -0,0 +1,192 @@
+import unittest
+from time import perf_counter
+from trix.utilities import Variation
+from trix.agent import BeamSearchAgent, MinimalSearchAgent, MinimalSearchNode, Rebase, Tracker, from_name, path_to, successor_actions, variation_along
+from .games import GameSetup
+
+class TestBeamSearchAgent(GameSetup, unittest.TestCase):
+
+  def test_registered_by_name(self):
+    self.assertIs(BeamSearchAgent, from_name('beam'))
+
+  def test_finding_variations_clearing_rows(self):
+    # On a board four wide, every flat I piece clears a row.
+    self.config.width  = 4
+    self.config.buffer = 0
+    env   = self.environment_for('11')
+    agent = BeamSearchAgent(env)
+    env.update(agent.find_variation(env).root_action)
+    env.update(agent.find_variation(env).root_action)
+    self.assertEqual(2, env.board.cleared)
+    self.assertEqual(0, env.board.height())
+
+  def test_looking_no_deeper_than_the_depth(self):
+    self.config.beam_depth = 2
+    self.config.buffer     = 2
+    env       = self.environment_for('1234567')
+    variation = BeamSearchAgent(env).find_variation(env)
+    self.assertEqual(2, variation.number_of_actions)
+
+  def test_stopping_when_out_of_pieces(self):
+    env       = self.environment_for('2')
+    variation = BeamSearchAgent(env).find_variation(env)
+    self.assertEqual(1, variation.number_of_actions)
+    self.assertEqual(2, variation.height)
+
+class TestBruteForceAgent(GameSetup, unittest.TestCase):
+
+  def test_expanding_at_most_the_nodes_for_each_decision(self):
+    self.config.nodes = 1
+    env     = self.environment_for('12')
+    agent   = from_name('bfs')(env)
+    percept = env.perceive()
+    self.assertIsNotNone(agent.choose_action(percept))
+    # Only the root is expanded, so only its children are visited.
+    self.assertEqual(len(list(agent.possible_actions_for(env, percept.piece))), agent.visited)
+
+class TestPlayingAGame(GameSetup, unittest.TestCase):
+
+  buffer = 2
+
+  def placed(self, names, name, **entries):
+    self.config.__dict__.update(entries)
+    env   = self.environment_for(names)
+    agent = from_name(name)(env)
+    agent.render_history = lambda: None
+    agent.run()
+    self.assertEqual([], env.buffer)
+    return [action.piece.name for action in env.history if action.render()]
+
+  def test_placing_every_piece_left_in_the_buffer(self):
+    names = '1234567'
+    for name in ('beam', 'bfs', 'random', 'search'):
+      self.assertEqual(sorted(names), sorted(self.placed(names, name)), name)
+    self.assertEqual(sorted(names), sorted(self.placed(names, 'search', search='ida')))
+    self.assertEqual(sorted(names), sorted(self.placed(names, 'search', time_per_piece=0.01)))
+
+class TestParallelSearch(GameSetup, unittest.TestCase):
+
+  width = 4
+
+  def test_following_paths_between_environments(self):
+    env       = self.environment_for('2121')
+    variation = MinimalSearchAgent(env).find_variation(env, env.perceive())
+    path      = path_to(env, variation.actions)
+    self.assertEqual(len(variation.actions), len(path))
+    self.assertEqual(variation.actions, variation_along(env.detached(len(path) + 1), path).actions)
+
+  def test_making_one_child_without_the_others(self):
+    env      = self.environment_for('2121')
+    root     = MinimalSearchNode(Variation(env, -1, []), None, Tracker({}, 3), root_node=True)
+    children = list(root.children())
+    for index in (0, 3, len(children) - 1):
+      child = root.child(index)
+      self.assertIs(children[index].action, child.action)
+      self.assertEqual(children[index].state_key(), child.state_key())
+
+  def test_finding_the_same_goal_as_a_single_search(self):
+    env    = self.environment_for('2121')
+    serial = MinimalSearchAgent(env).find_variation(env, env.perceive())
+    self.config.jobs = 2
+    agent  = MinimalSearchAgent(env)
+    try:
+      parallel = agent.find_variation(env, env.perceive())
+    finally:
+      agent.close()
+    self.assertEqual(0, serial.height)
+    self.assertEqual(serial.priority_score, parallel.priority_score)
+
+  def test_finding_the_same_goal_with_hash_distribution(self):
+    env    = self.environment_for('2121')
+    serial = MinimalSearchAgent(env).find_variation(env, env.perceive())
+    self.config.jobs     = 2
+    self.config.parallel = 'hda'
+    agent  = MinimalSearchAgent(env)
+    try:
+      distributed = agent.find_variation(env, env.perceive())
+    finally:
+      agent.close()
+    self.assertEqual(serial.priority_score, distributed.priority_score)
+
+class TestSearchReuse(GameSetup, unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.config.reuse = True
+
+  def test_rebasing_variations_under_the_committed_one(self):
+    env       = self.environment_for('2345')
+    root      = Variation(env, -1, [])
+    actions   = list(successor_actions(env))
+    committed = root.fork(actions[0])
+    under     = committed.fork(next(successor_actions(committed.environment)))
+    under.utility
+    rebase    = Rebase(committed)
+    rebased   = rebase.variation(under)
+    self.assertEqual(under.actions[1:], rebased.actions)
+    self.assertEqual(0, rebased.depth)
+    self.assertIs(under.environment, rebased.environment)
+    self.assertEqual(under.utility, rebased._utility)
+    self.assertIs(rebased, rebase.variation(under))
+    self.assertIsNone(rebase.variation(root.fork(actions[1])))
+    self.assertIsNone(rebase.variation(root))
+
+  def test_seeding_the_next_search_from_the_last(self):
+    env      = self.environment_for('2345671')
+    agent    = MinimalSearchAgent(env)
+    seeded   = []
+    original = agent.seed
+    def seed(search, tracker, goal_height):
+      original(search, tracker, goal_height)
+      for priority, node in search.frontier:
+        replayed = env
+        for action in node.base_variation.actions: replayed = replayed.fork(action)
+        seeded.append((replayed.zobrist, node.base_variation.environment.zobrist))
+    agent.seed = seed
+    agent.take_turn(env.perceive())
+    self.assertIsNotNone(agent.previous)
+    agent.take_turn(env.perceive())
+    self.assertTrue(seeded)
+    for replayed, found in seeded: self.assertEqual(replayed, found)
+
+  def test_playing_every_piece(self):
+    played = []
+    for reuse in (False, True):
+      self.config.reuse = reuse
+      env   = self.environment_for('23456712')
+      agent = MinimalSearchAgent(env)
+      agent.render_history = lambda: None
+      agent.run()
+      played.append(len(env.history))
+    self.assertEqual(played[0], played[1])
+
+class TestTimedSearch(GameSetup, unittest.TestCase):
+
+  width = 4
+
+  def test_always_finding_a_variation(self):
+    self.config.time_per_piece = 0
+    env       = self.environment_for('2345671')
+    variation = MinimalSearchAgent(env).find_variation(env, env.perceive())
+    self.assertEqual(1, variation.number_of_actions)
+
+  def test_finding_the_same_goal_as_the_node_budget(self):
+    env    = self.environment_for('2121')
+    serial = MinimalSearchAgent(env).find_variation(env, env.perceive())
+    self.config.time_per_piece = 10
+    timed  = MinimalSearchAgent(env).find_variation(env, env.perceive())
+    self.assertEqual(0, timed.height)
+    self.assertEqual(serial.priority_score, timed.priority_score)
+
+  def test_sharing_out_the_game_budget(self):
+    env   = self.environment_for('2345')
+    self.assertIsNone(MinimalSearchAgent(env).deadline_for(env))
+    self.config.time_budget = 1.0
+    agent = MinimalSearchAgent(env)
+    agent.spent = 0.6
+    self.assertAlmostEqual(perf_counter() + 0.1, agent.deadline_for(env), places=2)
+    self.config.time_per_piece = 0.05
+    agent = MinimalSearchAgent(env)
+    self.assertAlmostEqual(perf_counter() + 0.05, agent.deadline_for(env), places=2)
+
+if __name__ == '__main__': unittest.main()
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+from trix import batch
+
+class TestBatch(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.input     = os.path.join(self.directory.name, 'in.x')
+    with open(self.input, 'w') as f: f.write('1234\n')
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_laying_out_the_grid(self):
+    configurations = list(batch.games(['a', 'b'], ['default', 'beam'], [11], [1, 2], 'out'))
+    self.assertEqual(8, len(configurations))
+    first = configurations[0]
+    self.assertEqual(('a', 'default', 11, 1), (first.input_file, first.agent, first.width, first.buffer))
+    self.assertEqual(os.path.join('out', 'a.default.w11.b1'), first.output_file)
+    self.assertEqual(['a'] * 4 + ['b'] * 4, [configuration.input_file for configuration in configurations])
+
+  def test_numbering_inputs_with_the_same_name(self):
+    configurations = list(batch.games(['a/in.c', 'b/in.c', 'b/in.d', 'b/in.c'], ['beam'], [11], [1], 'out'))
+    self.assertEqual(['in.c.1.beam.w11.b1', 'in.c.2.beam.w11.b1', 'in.d.beam.w11.b1', 'in.c.4.beam.w11.b1'],
+                     [os.path.basename(configuration.output_file) for configuration in configurations])
+
+  def test_rejecting_unknown_agents(self):
+    with self.assertRaises(ValueError):
+      list(batch.games(['a'], ['clever'], [11], [1], 'out'))
+
+  def test_playing_a_game(self):
+    configuration = next(batch.games([self.input], ['beam'], [6], [0], self.directory.name))
+    row           = batch.play(configuration)
+    self.assertEqual([self.input, 'beam', 6, 0], row[:4])
+    self.assertGreater(row[5], 0)
+    with open(configuration.output_file) as f:
+      self.assertEqual(4, len(f.read().splitlines()))
+
+  def test_summarising(self):
+    summary = batch.summarise([['in.a', 'beam', 11, 1, '0.10', 120, 2, 4, 3, 8]])
+    header, row = summary.splitlines()
+    self.assertTrue(header.startswith('input  agent  width  buffer'))
+    self.assertEqual(['in.a', 'beam', '11', '1', '0.10', '120', '2', '4', '3', '8'], row.split())
+
+  def test_running_from_the_command_line(self):
+    output = os.path.join(self.directory.name, 'out')
+    batch.main(['trix-batch', '-j', '1', '-a', 'random', '-b', '1,2', '-o', output, self.input])
+    self.assertEqual(['in.x.random.w11.b1', 'in.x.random.w11.b2', 'summary.txt'], sorted(os.listdir(output)))
+
+if __name__ == '__main__': unittest.main()
@@ -0,0 +1,50 @@
+import importlib.util
+import os
+import unittest
+
+# The suite is a script rather than part of the package.
+path  = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'suite.py')
+spec  = importlib.util.spec_from_file_location('suite', path)
+suite = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(suite)
+
+class TestRegressions(unittest.TestCase):
+
+  baseline = {
+    'micro': {'board_copy': {'seconds': 1.0, 'ops_per_second': 1.0}},
+    'games': {'in.a/default/b1': {'seconds': 2.0, 'nodes_per_second': 100.0, 'height': 4, 'holes': 0, 'cleared': 10}}
+  }
+
+  def results(self, **changes):
+    game = dict(self.baseline['games']['in.a/default/b1'], **changes)
+    return {'micro': self.baseline['micro'], 'games': {'in.a/default/b1': game}}
+
+  def test_nothing_worse_is_no_regression(self):
+    self.assertEqual([], suite.regressions(self.baseline, self.baseline, 0.2))
+    self.assertEqual([], suite.regressions(self.results(seconds=1.0, cleared=20), self.baseline, 0.2))
+
+  def test_finding_what_got_worse(self):
+    found = suite.regressions(self.results(seconds=3.0, nodes_per_second=50.0), self.baseline, 0.2)
+    self.assertEqual(2, len(found))
+    self.assertIn("games in.a/default/b1 seconds: 2 -> 3 (50% worse)", found)
+    self.assertTrue(any(regression.startswith("games in.a/default/b1 nodes_per_second") for regression in found))
+
+  def test_staying_within_the_threshold(self):
+    self.assertEqual([], suite.regressions(self.results(seconds=2.3), self.baseline, 0.2))
+
+  def test_anything_from_nothing_is_worse(self):
+    found = suite.regressions(self.results(holes=1), self.baseline, 0.2)
+    self.assertEqual(["games in.a/default/b1 holes: 0 -> 1 (100% worse)"], found)
+
+  def test_ignoring_what_was_not_run(self):
+    self.assertEqual([], suite.regressions({'micro': self.baseline['micro']}, self.baseline, 0.2))
+
+  def test_covering_everything_the_suite_runs_in_the_committed_baseline(self):
+    with open(os.path.join(os.path.dirname(path), 'baseline.json')) as f: baseline = suite.json.load(f)
+    self.assertEqual(sorted(setup.__name__ for setup in suite.Micro), sorted(baseline['micro']))
+    inputs = [os.path.basename(name) for name in suite.glob.glob(os.path.join(os.path.dirname(path), '..', 'data', 'in.*'))]
+    for name in inputs + ['synthetic-500']:
+      for agent in ('default', 'beam'):
+        for buffer in (1, 3): self.assertIn("%s/%s/b%d" % (name, agent, buffer), baseline['games'])
+
+if __name__ == '__main__': unittest.main()
@@ -95,6 +95,50 @@ class TestBoard(unittest.TestCase):
     self.assertEqual(3, board.depth_for_row(3))
     self.assertEqual(4, board.depth_for_row(4))
 
+  def test_tracking_column_heights(self):
+    board = Board(5)
+    self.assertEqual((0, 0, 0, 0, 0), board.heights)
+    board.place(self.piece_b, 0)
+    self.assertEqual((3, 1, 0, 0, 0), board.heights)
+    board.place(self.piece_a, 1)
+    self.assertEqual((3, 2, 3, 2, 0), board.heights)
+    self.assertEqual(0, board.depth_for_row(0))
+    self.assertEqual(1, board.depth_for_row(1))
+    self.assertEqual(3, board.depth_for_row(4))
+
+  def test_column_heights_after_clearing(self):
+    board  = Board(5)
+    upright = self.piece_c.rotate()
+    square  = Piece('5', ((1, 1), (1, 1)))
+    board.place(upright, 4)
+    board.place(self.piece_c, 0)
+    self.assertEqual(1, board.cleared)
+    self.assertEqual((0, 0, 0, 0, 3), board.heights)
+    board.place(self.piece_b, 0)
+    self.assertEqual((3, 1, 0, 0, 3), board.heights)
+    board.place(square, 2)
+    self.assertEqual(2, board.cleared)
+    self.assertEqual(2, board.height())
+    self.assertEqual((2, 0, 1, 1, 2), board.heights)
+    self.assertEqual(2, board.depth_for_row(1))
+    self.assertEqual(4, board.bumpiness)
+    self.assertEqual(1, board.wells)
+    self.assertEqual(board.calculated_holes(), board.holes)
+    self.assertEqual(board.calculated_covered_holes(), board.covered_holes)
+    self.assertEqual(board.calculated_transitions(), board.transitions)
+
+  def test_tracking_board_statistics(self):
+    board = Board(5)
+    board.place(self.piece_b, 0)
+    board.place(self.piece_a, 1)
+    self.assertEqual((0b10100, 0b11110, 0b11000), board.rows)
+    self.assertEqual(8, board.filled)
+    self.assertEqual(7, board.holes)
+    self.assertEqual(2, board.covered_holes)
+    self.assertEqual(5, board.bumpiness)
+    self.assertEqual(3, board.wells)
+    self.assertEqual(8, board.transitions)
+
   def test_placing_on_top_of_each_other(self):
     board = self.board
     piece = self.piece_c
@@ -131,5 +175,34 @@ class TestBoard(unittest.TestCase):
     self.assertNotEqual(board.maximum_height, copy.maximum_height)
     self.assertEqual(board.width, copy.width)
 
+  def test_copying_a_board_shares_the_rows(self):
+    board = self.board
+    board.place(self.piece_c, 0)
+    copy = board.copy()
+    self.assertIs(board.rows, copy.rows)
+    copy.place(self.piece_c, 4)
+    self.assertIsNot(board.rows, copy.rows)
+    self.assertEqual((0b11110000000,), board.rows)
+    self.assertEqual((0b11111111000,), copy.rows)
+
+  def test_copying_a_board_without_tiles(self):
+    board = self.board
+    board.place(self.piece_c, 0)
+    copy = board.copy(tiles=False)
+    self.assertIsNone(copy.tiles)
+    self.assertEqual("+-----------+\n|####       |\n+-----------+", copy.render())
+    copy.place(self.piece_c, 4)
+    copy.place(self.piece_a, 8)
+    self.assertEqual(1, copy.height())
+    self.assertEqual(1, copy.cleared)
+    self.assertEqual("+-----------+\n|         # |\n+-----------+", copy.render())
+    self.assertEqual("+-----------+\n|3333       |\n+-----------+", board.render())
+
+  def test_board_rows_are_bit_masks(self):
+    board = Board(5)
+    board.place(self.piece_b, 0)
+    self.assertEqual((0b10000, 0b10000, 0b11000), board.rows)
+    self.assertEqual(11, board.holes)
+
 
 if __name__ == '__main__': unittest.main()
\ No newline at end of file
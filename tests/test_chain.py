@@ -0,0 +1,31 @@
+import unittest
+from trix.chain import Chain
+
+class TestChain(unittest.TestCase):
+
+  def test_empty_chain(self):
+    chain = Chain()
+    self.assertEqual(0, len(chain))
+    self.assertFalse(chain)
+    self.assertEqual([], chain.to_list())
+    with self.assertRaises(IndexError):
+      chain.first()
+
+  def test_appending_values(self):
+    chain = Chain().append('a').append('b').append('c')
+    self.assertEqual(3, len(chain))
+    self.assertEqual('a', chain.first())
+    self.assertEqual(['a', 'b', 'c'], chain.to_list())
+    self.assertEqual(['a', 'b', 'c'], list(chain))
+
+  def test_appending_shares_the_parent(self):
+    base   = Chain.from_list(['a', 'b'])
+    left   = base.append('c')
+    right  = base.append('d')
+    self.assertIs(base, left.parent)
+    self.assertIs(base, right.parent)
+    self.assertEqual(['a', 'b'], base.to_list())
+    self.assertEqual(['a', 'b', 'c'], left.to_list())
+    self.assertEqual(['a', 'b', 'd'], right.to_list())
+
+if __name__ == '__main__': unittest.main()
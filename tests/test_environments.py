@@ -1,7 +1,9 @@
 import unittest
 import trix.config
 from unittest.mock import MagicMock
-from trix.environment import Piece, Board, Environment
+import io
+from trix.environment import Piece, Board, Environment, PieceStream, StreamingEnvironment
+from trix.game import Pieces, placements_for
 from trix.actions import Action
 from trix.percept import Percept
 
@@ -166,6 +168,33 @@ class TestEnvironment(unittest.TestCase):
     self.assertNotEqual(env.buffer, copy.buffer)
     self.assertNotEqual(env.items, copy.items)
 
+  def test_copies_share_state_until_changed(self):
+    piece_a, piece_b = self.piece_a, self.piece_b
+    config = self.config
+    config.buffer = 2
+    env = Environment(config, [])
+    env.add_to_buffer(piece_a)
+    copy = env.copy()
+    self.assertIs(env.board, copy.board)
+    self.assertIs(env.buffer, copy.buffer)
+    copy.add_to_buffer(piece_b)
+    self.assertIsNot(env.buffer, copy.buffer)
+    self.assertIsNot(env.board, copy.board)
+    self.assertIs(env.board.rows, copy.board.rows)
+    self.assertEqual([piece_a], env.buffer)
+    self.assertEqual([piece_a, piece_b], copy.buffer)
+
+  def test_copies_do_not_track_tiles(self):
+    env = Environment(self.config, [])
+    env.place_piece_at(self.piece_a, 0)
+    copy = env.copy()
+    copy.place_piece_at(self.piece_a, 4)
+    env.place_piece_at(self.piece_a, 8)
+    self.assertIsNotNone(env.board.tiles)
+    self.assertIsNone(copy.board.tiles)
+    self.assertEqual("| 1       1 |", env.board.render().split("\n")[1])
+    self.assertEqual("| #   #     |", copy.board.render().split("\n")[1])
+
   def test_consuming_items(self):
     piece_a, piece_b, piece_c = self.piece_a, self.piece_b, self.piece_c
     env = Environment(self.config, [piece_a, piece_c, piece_b, piece_a])
@@ -179,6 +208,30 @@ class TestEnvironment(unittest.TestCase):
     env.consume()
     self.assertEqual([], env.items)
 
+  def test_consuming_items_leaves_the_sequence_intact(self):
+    piece_a, piece_b = self.piece_a, self.piece_b
+    pieces = [piece_a, piece_b]
+    env    = Environment(self.config, pieces)
+    copy   = env.copy()
+    self.assertIs(env.pieces, copy.pieces)
+    copy.consume()
+    self.assertEqual([piece_a, piece_b], pieces)
+    self.assertEqual([piece_a, piece_b], env.items)
+    self.assertEqual([piece_b], copy.items)
+    self.assertEqual(piece_b, copy.perceive().piece)
+
+  def test_indexing_upcoming_items(self):
+    piece_a, piece_b, piece_c = self.piece_a, self.piece_b, self.piece_c
+    env = Environment(self.config, [piece_a, piece_b, piece_c])
+    env.consume()
+    items = env.items
+    self.assertEqual(2, len(items))
+    self.assertEqual(piece_b, items[0])
+    self.assertEqual(piece_c, items[1])
+    self.assertEqual(piece_c, items[-1])
+    with self.assertRaises(IndexError):
+      items[2]
+
 
   def test_forking_the_environment(self):
     env = Environment(self.config, [])
@@ -190,5 +243,73 @@ class TestEnvironment(unittest.TestCase):
     self.assertEqual([action], copy.history)
     FakeAction.apply.assert_called_with(copy)
 
+  def test_forks_share_their_history(self):
+    env = Environment(self.config, [])
+    class FakeAction(Action): apply = MagicMock()
+    first, second, third = FakeAction(), FakeAction(), FakeAction()
+    env.update(first)
+    left  = env.fork(second)
+    right = env.fork(third)
+    self.assertEqual([first], env.history)
+    self.assertEqual([first, second], left.history)
+    self.assertEqual([first, third], right.history)
+
+class TestPieceStream(unittest.TestCase):
+
+  def setUp(self):
+    self.read = []
+
+  def source(self, names):
+    for name in names:
+      self.read.append(name)
+      yield Pieces[name]
+
+  def test_reading_ahead_no_further_than_the_window(self):
+    stream = PieceStream(self.source('1234567'), 3)
+    self.assertEqual(['1', '2', '3'], self.read)
+    self.assertEqual(3, len(stream))
+    self.assertIs(Pieces['3'], stream[2])
+
+  def test_dropping_pieces_behind_the_position(self):
+    stream = PieceStream(self.source('1234567'), 3)
+    stream.advance(2)
+    self.assertEqual(5, len(stream))
+    self.assertIs(Pieces['5'], stream[4])
+    with self.assertRaises(IndexError): stream[1]
+
+  def test_running_out(self):
+    stream = PieceStream(self.source('12'), 3)
+    stream.advance(2)
+    self.assertTrue(stream.exhausted)
+    self.assertEqual(2, len(stream))
+
+class TestStreamingEnvironment(unittest.TestCase):
+
+  def setUp(self):
+    self.config = trix.config.Configuration()
+    self.config.merge(trix.config.defaults)
+    self.config.width = 4
+    self.output = io.StringIO()
+    self.env    = StreamingEnvironment(self.config, PieceStream((Pieces[name] for name in '1212'), 2), self.output, flush_every=2)
+
+  def test_writing_out_each_placement(self):
+    placements = placements_for(4)
+    self.env.update(placements.add_to_buffer['1'])
+    self.env.update(placements.place_next['2'][0])
+    self.assertEqual(['2 0 0'], self.output.getvalue().splitlines())
+    self.assertEqual([], self.env.history)
+
+  def test_moving_the_stream_on(self):
+    placements = placements_for(4)
+    self.env.update(placements.place_next['1'][1])
+    self.env.update(placements.place_next['2'][0])
+    self.assertEqual(2, self.env.pieces.start)
+    self.assertEqual(['1', '2'], [piece.name for piece in self.env.items])
+
+  def test_forks_are_plain_environments(self):
+    fork = self.env.fork(placements_for(4).place_next['1'][1])
+    self.assertFalse(fork.streaming)
+    self.assertEqual('', self.output.getvalue())
+    self.assertEqual(0, self.env.pieces.start)
 
 if __name__ == '__main__': unittest.main()
\ No newline at end of file
@@ -0,0 +1,83 @@
+import io
+import os
+import tempfile
+import unittest
+from trix.game import Pieces, PieceArray, placements_for, readPieces, loadPieces, streamPieces
+from trix.actions import AddToBuffer, PlaceFromBuffer
+
+class TestPlacements(unittest.TestCase):
+
+  def test_rotations_are_in_order(self):
+    placements = placements_for(11)
+    self.assertEqual([0], [rotation.piece.rotation for rotation in placements.rotations['2']])
+    self.assertEqual([0, 1], [rotation.piece.rotation for rotation in placements.rotations['1']])
+    self.assertEqual([0, 1, 2, 3], [rotation.piece.rotation for rotation in placements.rotations['3']])
+
+  def test_rotation_profiles(self):
+    upright, flat = placements_for(11).rotations['1']
+    self.assertEqual((1, (0,), (3,)), (upright.width, upright.bottom, upright.top))
+    self.assertEqual((4, (0, 0, 0, 0), (0, 0, 0, 0)), (flat.width, flat.bottom, flat.top))
+
+  def test_an_action_for_every_offset(self):
+    upright, flat = placements_for(11).rotations['1']
+    self.assertEqual(list(range(11)), [action.left_offset for action in upright.place_next])
+    self.assertEqual(list(range(8)), [action.left_offset for action in flat.place_next])
+    self.assertEqual(19, len(placements_for(11).place_next['1']))
+    self.assertEqual(19, len(placements_for(11).place_from_buffer['1']))
+    for action in flat.place_from_buffer:
+      self.assertIsInstance(action, PlaceFromBuffer)
+      self.assertIs(Pieces['1'], action.original_piece)
+      self.assertIs(flat.piece, action.piece)
+
+  def test_tables_are_built_once_per_width(self):
+    self.assertIs(placements_for(11), placements_for(11))
+    self.assertIs(placements_for(7), placements_for(7))
+    self.assertEqual(4, len(placements_for(7).rotations['1'][1].place_next))
+
+  def test_buffering_actions(self):
+    action = placements_for(11).add_to_buffer['5']
+    self.assertIsInstance(action, AddToBuffer)
+    self.assertIs(Pieces['5'], action.piece)
+
+class TestStreamingPieces(unittest.TestCase):
+
+  def test_reading_pieces_lazily(self):
+    source = io.StringIO("12x3\n45\n")
+    pieces = streamPieces(source, chunk=2)
+    self.assertEqual(Pieces['1'], next(pieces))
+    self.assertEqual(2, source.tell())
+    self.assertEqual(['2', '3', '4', '5'], [piece.name for piece in pieces])
+
+class TestLoadingPieces(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def write(self, content):
+    path = os.path.join(self.directory.name, 'in')
+    with open(path, 'wb') as f: f.write(content)
+    return path
+
+  def test_reading_the_same_pieces(self):
+    path = self.write(b"1234567\n89 0 ab7\r\n\xc3\xa91")
+    self.assertEqual(readPieces(path), list(loadPieces(path)))
+
+  def test_reading_a_chunk_at_a_time(self):
+    path = self.write(b"12x34\n" * 10)
+    self.assertEqual(readPieces(path), list(loadPieces(path, chunk=4)))
+
+  def test_reading_empty_files(self):
+    self.assertEqual(0, len(loadPieces(self.write(b""))))
+
+  def test_indexing_the_pieces(self):
+    pieces = PieceArray(b"172")
+    self.assertEqual(3, len(pieces))
+    self.assertIs(Pieces['7'], pieces[1])
+    self.assertIs(Pieces['2'], pieces[-1])
+    with self.assertRaises(IndexError): pieces[3]
+    self.assertFalse(hasattr(PieceArray, 'name') or hasattr(PieceArray, 'piece'))
+
+if __name__ == '__main__': unittest.main()
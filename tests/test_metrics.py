@@ -0,0 +1,109 @@
+import io
+import json
+import unittest
+from trix.agent import MinimalSearchAgent, BeamSearchAgent
+from trix.metrics import Histogram, Metrics, MeteredFrontier
+from trix.search import HeapFrontier
+from trix.utilities import Referee
+from .games import GameSetup
+
+class TestHistogram(unittest.TestCase):
+
+  def test_doubling_buckets(self):
+    histogram = Histogram(smallest=1, buckets=3)
+    for value in (0.5, 1, 1.5, 3, 4, 100): histogram.add(value)
+    self.assertEqual([1, 2, 4], histogram.bounds)
+    self.assertEqual([2, 1, 2, 1], histogram.counts)
+
+class TestMetrics(GameSetup, unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.output = io.StringIO()
+
+  def records(self):
+    return [json.loads(line) for line in self.output.getvalue().splitlines()]
+
+  def play(self, agent_class, names='12345'):
+    agent = agent_class(self.environment_for(names))
+    agent.render_history = lambda: None
+    agent.instrument(Metrics(self.output))
+    agent.run()
+    agent.metrics.close()
+    return agent, self.records()
+
+  def test_recording_each_piece_and_a_summary(self):
+    agent, records = self.play(MinimalSearchAgent)
+    decisions, summary = records[:-1], records[-1]
+    self.assertTrue(summary['summary'])
+    self.assertEqual(len(decisions), summary['decisions'])
+    self.assertEqual(list(range(len(decisions))), [record['decision'] for record in decisions])
+    self.assertEqual(agent.visited, sum(record['visited'] for record in decisions))
+    self.assertEqual(len(decisions), sum(summary['latency']['counts']))
+
+  def test_recording_the_pieces_placed(self):
+    agent, records = self.play(MinimalSearchAgent)
+    placed = [name for record in records[:-1] for name in record['placed']]
+    self.assertEqual([action.piece.name for action in agent.environment.history if action.render()], placed)
+    self.assertEqual(len(placed), records[-1]['placed'])
+
+  def test_counting_the_search(self):
+    agent, records = self.play(MinimalSearchAgent)
+    summary = records[-1]
+    # Every node visited is either expanded, cut off or the goal, and so is each root.
+    unaccounted = summary['visited'] + summary['decisions'] - summary['expanded'] - summary['pruned']
+    self.assertTrue(0 <= unaccounted <= summary['decisions'])
+    self.assertGreaterEqual(summary['generated'], summary['visited'])
+    self.assertGreater(summary['frontier_peak'], 0)
+    self.assertEqual(['fork', 'queue', 'score', 'successors'], sorted(summary['phases']))
+
+  def test_recording_how_often_scores_come_from_the_cache(self):
+    cache        = Referee.cache
+    hits, misses = cache.hits, cache.misses
+    agent, records = self.play(MinimalSearchAgent)
+    scores = records[-1]['scores']
+    self.assertEqual(cache.hits - hits, scores['hits'])
+    self.assertEqual(cache.misses - misses, scores['misses'])
+    self.assertGreater(scores['hits'] + scores['misses'], 0)
+    self.assertAlmostEqual(scores['hits'] / (scores['hits'] + scores['misses']), scores['hit_rate'])
+
+  def test_playing_the_same_game(self):
+    played = MinimalSearchAgent(self.environment_for('12345'))
+    played.render_history = lambda: None
+    played.run()
+    agent, records = self.play(MinimalSearchAgent)
+    self.assertEqual(played.environment.history, agent.environment.history)
+
+  def test_counting_duplicates_in_the_timed_search(self):
+    self.config.time_per_piece = 0.02
+    agent, records = self.play(MinimalSearchAgent)
+    self.assertGreater(records[-1]['deduplicated'], 0)
+
+  def test_recording_the_transposition_table(self):
+    agent, records = self.play(MinimalSearchAgent, '1212')
+    table = agent.table
+    self.assertEqual(table.hits, records[-1]['deduplicated'])
+    self.assertEqual(table.misses, records[-1]['admitted'])
+    self.assertGreater(records[-1]['table_hit_rate'], 0)
+    for record in records:
+      lookups = record['deduplicated'] + record['admitted']
+      self.assertAlmostEqual(record['deduplicated'] / lookups if lookups else 0.0, record['table_hit_rate'])
+
+  def test_recording_other_agents(self):
+    agent, records = self.play(BeamSearchAgent)
+    self.assertEqual(agent.visited, records[-1]['visited'])
+    self.assertEqual(0, records[-1]['expanded'])
+
+class TestMeteredFrontier(unittest.TestCase):
+
+  def test_keeping_track_of_the_peak(self):
+    metrics  = Metrics(io.StringIO())
+    frontier = MeteredFrontier(HeapFrontier(), metrics)
+    frontier.push(2, 'b')
+    frontier.push(1, 'a')
+    self.assertEqual('a', frontier.pop())
+    frontier.push(3, 'c')
+    self.assertEqual(2, len(frontier))
+    self.assertEqual(2, metrics.frontier_peak)
+
+if __name__ == '__main__': unittest.main()
@@ -43,6 +43,17 @@ class TestPieces(unittest.TestCase):
     piece_d = Piece('4', ((1,), (1,), (1,), (1,)))
     self.assertEqual([0b1, 0b1, 0b1, 0b1], piece_d.bit_masks)
 
+  def test_calculating_profiles(self):
+    piece_a = Piece('1', ((0, 1, 0), (1, 1, 1)))
+    self.assertEqual((0, 0, 0), piece_a.bottom)
+    self.assertEqual((0, 1, 0), piece_a.top)
+    piece_b = Piece('2', ((1, 1), (0, 1), (0, 1)))
+    self.assertEqual((2, 0), piece_b.bottom)
+    self.assertEqual((2, 2), piece_b.top)
+    piece_c = Piece('3', ((1, 0), (1, 1), (0, 1)))
+    self.assertEqual((1, 0), piece_c.bottom)
+    self.assertEqual((2, 1), piece_c.top)
+
   def test_rotating_piece(self):
     piece_a = Piece('a', ((1, 0, 0), (1, 1, 1)))
     self.assertEqual(0, piece_a.rotation)
@@ -0,0 +1,52 @@
+import os
+import pstats
+import tempfile
+import unittest
+from trix.environment import Board
+from trix.game import Pieces
+from trix.profiling import Profiler, StackSampler
+
+def boards():
+  kept = []
+  for game in range(200):
+    board = Board(6, tiles=False)
+    for offset in range(5): board.place(Pieces['2'], offset % 5)
+    kept.append(board)
+  return kept
+
+class TestProfiler(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.prefix    = os.path.join(self.directory.name, 'game')
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def profile(self):
+    with Profiler(self.prefix, interval=0.0005) as profiler:
+      self.kept = boards()
+    return profiler
+
+  def test_writing_the_statistics(self):
+    self.profile()
+    stats = pstats.Stats(self.prefix + '.pstats')
+    self.assertIn('boards', [function for filename, line, function in stats.stats])
+
+  def test_putting_memory_down_to_functions(self):
+    profiler = self.profile()
+    sites    = [site for size, count, site in profiler.memory.sites()]
+    self.assertIn('environment.py:Board.place', sites)
+    with open(self.prefix + '.memory') as f:
+      self.assertTrue(f.readline().startswith('Peak traced memory'))
+
+  @unittest.skipUnless(StackSampler.available, "needs SIGPROF")
+  def test_writing_collapsed_stacks(self):
+    profiler = self.profile()
+    with open(self.prefix + '.folded') as f: lines = f.read().splitlines()
+    self.assertEqual(sum(profiler.sampler.stacks.values()), sum(int(line.rsplit(' ', 1)[1]) for line in lines))
+    for line in lines:
+      stack, count = line.rsplit(' ', 1)
+      self.assertTrue(all(':' in frame for frame in stack.split(';')))
+
+if __name__ == '__main__': unittest.main()
@@ -0,0 +1,263 @@
+import unittest
+from trix.search import Node, AStar, IDAStar, HDAStar, TranspositionTable, HeapFrontier, BucketFrontier
+
+class GraphNode(Node):
+  "A node in a small explicit graph, recording the order nodes are visited in."
+
+  def __init__(self, graph, name, visits, cost=0, goal=None):
+    super().__init__(cost)
+    self.graph  = graph
+    self.name   = name
+    self.visits = visits
+    self.goal   = goal
+
+  def is_goal(self):
+    return self.name == self.goal
+
+  def visit(self):
+    self.visits.append(self.name)
+
+  def state_key(self):
+    return self.name
+
+  def children(self):
+    for name in self.graph.get(self.name, []):
+      yield GraphNode(self.graph, name, self.visits, self.cost + 1, self.goal)
+
+class TestTranspositionTable(unittest.TestCase):
+
+  def test_admitting_new_and_cheaper_states(self):
+    table = TranspositionTable(10)
+    self.assertTrue(table.admit('a', 3))
+    self.assertFalse(table.admit('a', 3))
+    self.assertFalse(table.admit('a', 4))
+    self.assertTrue(table.admit('a', 2))
+    self.assertEqual(2, table.hits)
+    self.assertEqual(2, table.misses)
+    self.assertEqual(1, len(table))
+    self.assertEqual(2, table.entries['a'])
+
+  def test_counting_hits_and_misses(self):
+    table = TranspositionTable(10)
+    table.admit('a', 1)
+    table.admit('a', 1)
+    table.admit('b', 1)
+    table.admit('a', 1)
+    self.assertEqual(2, table.hits)
+    self.assertEqual(2, table.misses)
+    self.assertEqual(0.5, table.hit_rate())
+
+  def test_lru_eviction(self):
+    table = TranspositionTable(2, 'lru')
+    table.admit('a', 1)
+    table.admit('b', 1)
+    table.admit('a', 1)
+    table.admit('c', 1)
+    self.assertIn('a', table.entries)
+    self.assertNotIn('b', table.entries)
+    self.assertEqual(1, table.evictions)
+
+  def test_fifo_eviction(self):
+    table = TranspositionTable(2, 'fifo')
+    table.admit('a', 1)
+    table.admit('b', 1)
+    table.admit('a', 1)
+    table.admit('c', 1)
+    self.assertNotIn('a', table.entries)
+    self.assertIn('b', table.entries)
+
+  def test_unknown_policies(self):
+    with self.assertRaises(TranspositionTable.UnknownPolicy):
+      TranspositionTable(2, 'random')
+
+class FrontierExamples(object):
+
+  def test_popping_an_empty_frontier(self):
+    frontier = self.frontier_class()
+    self.assertEqual(0, len(frontier))
+    self.assertIsNone(frontier.pop())
+
+  def test_popping_in_priority_order(self):
+    frontier = self.frontier_class()
+    for priority, node in [(3, 'c'), (-1, 'a'), (7, 'd'), (0, 'b')]:
+      frontier.push(priority, node)
+    self.assertEqual(4, len(frontier))
+    self.assertEqual(['a', 'b', 'c', 'd'], [frontier.pop() for _ in range(4)])
+    self.assertEqual(0, len(frontier))
+
+  def test_breaking_ties_in_insertion_order(self):
+    frontier = self.frontier_class()
+    for node in ['a', 'b', 'c']: frontier.push(1, node)
+    frontier.push(0, 'first')
+    self.assertEqual(['first', 'a', 'b', 'c'], [frontier.pop() for _ in range(4)])
+
+  def test_nodes_are_never_compared(self):
+    frontier = self.frontier_class()
+    frontier.push(1, object())
+    frontier.push(1, object())
+    self.assertIsNotNone(frontier.pop())
+
+  def test_iterating_in_pop_order(self):
+    frontier = self.frontier_class()
+    for priority, node in [(2, 'c'), (1, 'a'), (2, 'd'), (1, 'b')]:
+      frontier.push(priority, node)
+    self.assertEqual([(1, 'a'), (1, 'b'), (2, 'c'), (2, 'd')], list(frontier))
+    self.assertEqual(['a', 'b', 'c', 'd'], [frontier.pop() for _ in range(4)])
+
+class TestHeapFrontier(FrontierExamples, unittest.TestCase):
+  frontier_class = HeapFrontier
+
+class TestBucketFrontier(FrontierExamples, unittest.TestCase):
+  frontier_class = BucketFrontier
+
+class TestAStar(unittest.TestCase):
+
+  graph = {'a': ['b', 'c'], 'b': ['d'], 'c': ['d'], 'd': ['e']}
+
+  def test_searching_without_a_table_revisits_states(self):
+    visits = []
+    AStar(GraphNode(self.graph, 'a', visits)).search()
+    self.assertEqual(2, visits.count('d'))
+    self.assertEqual(2, visits.count('e'))
+
+  def test_searching_with_a_table_skips_duplicates(self):
+    visits = []
+    table  = TranspositionTable(10)
+    AStar(GraphNode(self.graph, 'a', visits), table).search()
+    self.assertEqual(['a', 'b', 'c', 'd', 'e'], sorted(visits))
+    self.assertEqual(1, table.hits)
+
+  def test_setting_aside_nodes_not_expanded(self):
+    search = AStar(GraphNode(self.graph, 'a', []), TranspositionTable(10))
+    search.set_aside = []
+    search.search()
+    self.assertEqual(['d'], [node.name for node in search.set_aside])
+    # Along with the node taken when the budget runs out.
+    search = AStar(GraphNode(self.graph, 'a', []))
+    search.set_aside = []
+    search.maximum   = 0
+    search.search()
+    self.assertEqual(['b'], [node.name for node in search.set_aside])
+
+  def test_giving_up_at_the_deadline(self):
+    visits = []
+    search = AStar(GraphNode(self.graph, 'a', visits))
+    search.deadline = 0
+    self.assertIsNone(search.search())
+    self.assertTrue(search.expired)
+    self.assertEqual(['a'], visits)
+
+  def test_searching_with_each_frontier(self):
+    for frontier_class in [HeapFrontier, BucketFrontier]:
+      visits = []
+      AStar(GraphNode(self.graph, 'a', visits), frontier=frontier_class).search()
+      self.assertEqual(['a', 'b', 'c', 'd', 'd', 'e', 'e'], visits)
+
+class TestIDAStar(unittest.TestCase):
+
+  graph = {'a': ['b', 'c'], 'b': ['d'], 'c': ['d', 'f'], 'd': ['e'], 'f': ['g']}
+
+  def test_deepening_until_the_goal_is_found(self):
+    visits = []
+    search = IDAStar(GraphNode(self.graph, 'a', visits, goal='g'))
+    result = search.search()
+    self.assertEqual('g', result.name)
+    self.assertEqual(3, result.cost)
+    # Each pass searches one level deeper, starting from the root again.
+    self.assertEqual(['a', 'a', 'b', 'c', 'a', 'b', 'd', 'c', 'd', 'f', 'a', 'b', 'd', 'e'], visits[:14])
+
+  def test_returning_nothing_without_a_goal(self):
+    visits = []
+    self.assertIsNone(IDAStar(GraphNode(self.graph, 'a', visits)).search())
+    self.assertIn('g', visits)
+
+  def test_skipping_duplicates_within_a_pass(self):
+    visits = []
+    IDAStar(GraphNode(self.graph, 'a', visits, goal='g'), TranspositionTable(10)).search()
+    self.assertEqual(['a', 'a', 'b', 'c', 'a', 'b', 'd', 'c', 'f', 'a', 'b', 'd', 'e', 'c', 'f', 'g'], visits)
+
+  def test_respecting_the_ceiling(self):
+    visits = []
+    search = IDAStar(GraphNode(self.graph, 'a', visits, goal='g'), ceiling=1)
+    self.assertIsNone(search.search())
+    self.assertEqual(['a', 'a'], visits)
+    self.assertEqual(1, search.truncated)
+    self.assertEqual(0, search.peak)
+
+  def test_respecting_the_maximum(self):
+    visits = []
+    search = IDAStar(GraphNode(self.graph, 'a', visits, goal='g'))
+    search.maximum = 4
+    self.assertIsNone(search.search())
+    self.assertEqual(5, len(visits))
+
+  def test_giving_up_at_the_deadline(self):
+    visits = []
+    search = IDAStar(GraphNode(self.graph, 'a', visits, goal='g'))
+    search.deadline = 0
+    self.assertIsNone(search.search())
+    self.assertTrue(search.expired)
+    self.assertEqual(['a'], visits)
+
+class FailingNode(GraphNode):
+  "A GraphNode that can't generate the children of one node."
+
+  def children(self):
+    if self.name == 'c': raise ValueError("no children for c")
+    for child in super().children():
+      yield FailingNode(child.graph, child.name, child.visits, child.cost, child.goal)
+
+def visits_of(root):
+  return root.visits
+
+class TestHDAStar(unittest.TestCase):
+
+  graph = {'a': ['b', 'c'], 'b': ['d'], 'c': ['d', 'f'], 'd': ['e'], 'f': ['g']}
+
+  def setUp(self):
+    self.search = HDAStar(jobs=2, table_size=10, report=visits_of)
+
+  def tearDown(self):
+    self.search.close()
+
+  def visited(self, reports):
+    return sorted(name for visits in reports for name in visits)
+
+  def test_finding_the_path_to_the_goal(self):
+    path, reports = self.search.search(GraphNode(self.graph, 'a', [], goal='g'))
+    self.assertEqual((1, 1, 0), path)
+    self.assertIn('g', self.visited(reports))
+
+  def test_each_state_is_expanded_once(self):
+    path, reports = self.search.search(GraphNode(self.graph, 'a', []))
+    self.assertIsNone(path)
+    self.assertEqual(['a', 'b', 'c', 'd', 'e', 'f', 'g'], self.visited(reports))
+
+  def test_sharing_the_maximum(self):
+    path, reports = self.search.search(GraphNode(self.graph, 'a', [], goal='g'), maximum=2)
+    self.assertIsNone(path)
+    self.assertEqual(3, len(self.visited(reports)))
+
+  def test_running_one_search_after_another(self):
+    for i in range(3):
+      path, reports = self.search.search(GraphNode(self.graph, 'a', [], goal='e'))
+      self.assertIn(path, [(0, 0, 0), (1, 0, 0)])
+
+  def test_raising_when_a_worker_fails(self):
+    with self.assertRaises(HDAStar.WorkerFailed) as raised:
+      self.search.search(FailingNode(self.graph, 'a', []))
+    self.assertIn("no children for c", str(raised.exception))
+    # The workers carry on with the next search.
+    path, reports = self.search.search(GraphNode(self.graph, 'a', [], goal='g'))
+    self.assertEqual((1, 1, 0), path)
+
+  def test_raising_when_a_worker_dies(self):
+    self.search.workers[1].kill()
+    with self.assertRaises(HDAStar.WorkerFailed) as raised:
+      self.search.search(GraphNode(self.graph, 'a', [], goal='g'))
+    self.assertIn("exit code -9", str(raised.exception))
+    # New workers are started for the next search.
+    path, reports = self.search.search(GraphNode(self.graph, 'a', [], goal='g'))
+    self.assertEqual((1, 1, 0), path)
+
+if __name__ == '__main__': unittest.main()
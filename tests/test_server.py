@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+import trix.config
+from trix import runner
+from trix.game import Pieces
+from trix.server import Server, Session
+
+class TestSession(unittest.TestCase):
+
+  def setUp(self):
+    self.config = trix.config.Configuration()
+    self.config.merge(trix.config.defaults)
+    self.config.width = 6
+
+  def test_playing_the_same_game_as_the_runner(self):
+    names = '1234567123456712'
+    with tempfile.TemporaryDirectory() as directory:
+      self.config.input_file  = os.path.join(directory, 'in')
+      self.config.output_file = os.path.join(directory, 'out')
+      with open(self.config.input_file, 'w') as f: f.write(names + '\n')
+      runner.play(self.config)
+      with open(self.config.output_file) as f: expected = f.read().splitlines()
+    session = Session(self.config)
+    moves   = session.play([Pieces[name] for name in names]) + session.end()
+    self.assertEqual(expected, moves)
+    self.assertEqual(len(names), len(moves))
+
+  def test_playing_a_piece_at_a_time(self):
+    session = Session(self.config)
+    moves   = [move for name in '1234' for move in session.play([Pieces[name]])]
+    # With nothing to look ahead to, each piece is placed as soon as it arrives.
+    self.assertEqual(['1', '2', '3', '4'], [move.split()[0] for move in moves])
+    self.assertEqual(4, session.details()['pieces'])
+
+class TestServer(unittest.TestCase):
+
+  def setUp(self):
+    self.config = trix.config.Configuration()
+    self.config.merge(trix.config.defaults)
+    self.config.width = 6
+
+  async def request(self, reader, writer, line):
+    writer.write(line.encode() + b"\n")
+    lines = []
+    while True:
+      reply = (await reader.readline()).decode().rstrip("\n")
+      lines.append(reply)
+      if reply.startswith('ok') or reply.startswith('error'): return lines
+
+  async def game(self, port, requests):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    replies = [await self.request(reader, writer, line) for line in requests]
+    writer.write(b"quit\n")
+    self.assertEqual(b"", await reader.read())
+    writer.close()
+    return replies
+
+  def serve(self, *games):
+    async def run():
+      server    = Server(self.config, workers=2)
+      listening = await server.listen('127.0.0.1', 0)
+      port      = listening.sockets[0].getsockname()[1]
+      async with listening:
+        return await asyncio.gather(*(self.game(port, requests) for requests in games))
+    return asyncio.run(run())
+
+  def test_replying_with_placements(self):
+    [replies] = self.serve(['1', '22', 'stats'])
+    self.assertEqual(1, len(replies[0]) - 1)
+    self.assertEqual(['2', '2'], [move.split()[0] for move in replies[1][:-1]])
+    self.assertTrue(replies[1][-1].startswith('ok '))
+    stats = json.loads(replies[2][0])
+    self.assertEqual(2, stats['session']['requests'])
+    self.assertEqual(3, stats['session']['pieces'])
+    self.assertEqual(['hit_rate', 'hits', 'misses'], sorted(stats['session']['scores']))
+
+  def test_serving_games_side_by_side(self):
+    first, second = self.serve(['1', '2', '3'], ['1', 'reset', '1'])
+    self.assertEqual(3, len(first))
+    self.assertEqual(second[0][:-1], second[2][:-1])
+
+  def test_rejecting_what_it_does_not_understand(self):
+    [replies] = self.serve(['hello', '1'])
+    self.assertTrue(replies[0][0].startswith('error'))
+    self.assertTrue(replies[1][-1].startswith('ok'))
+
+if __name__ == '__main__': unittest.main()
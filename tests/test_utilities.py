@@ -0,0 +1,60 @@
+import unittest
+from trix.environment import Board
+from trix.game import Pieces
+from trix.utilities import Referee, ScoreCache
+
+class TestScoreCache(unittest.TestCase):
+
+  def setUp(self):
+    self.calls = []
+
+  def calculate(self, board):
+    self.calls.append(board)
+    return float(board.height())
+
+  def board_with(self, *placements):
+    board = Board(5, tiles=False)
+    for name, offset in placements: board.place(Pieces[name], offset)
+    return board
+
+  def test_scoring_each_board_once(self):
+    cache = ScoreCache(10)
+    board = self.board_with(('2', 0))
+    self.assertEqual(2.0, cache.score(board, self.calculate))
+    self.assertEqual(2.0, cache.score(board.copy(tiles=False), self.calculate))
+    self.assertEqual(1, len(self.calls))
+    self.assertEqual((1, 1), (cache.hits, cache.misses))
+    self.assertEqual(0.5, cache.hit_rate())
+
+  def test_boards_reached_by_different_paths(self):
+    cache = ScoreCache(10)
+    cache.score(self.board_with(('2', 0), ('2', 2)), self.calculate)
+    cache.score(self.board_with(('2', 2), ('2', 0)), self.calculate)
+    self.assertEqual(1, len(self.calls))
+
+  def test_evicting_the_least_recently_used(self):
+    cache = ScoreCache(2)
+    first, second, third = self.board_with(('2', 0)), self.board_with(('2', 1)), self.board_with(('2', 2))
+    cache.score(first, self.calculate)
+    cache.score(second, self.calculate)
+    cache.score(first, self.calculate)
+    cache.score(third, self.calculate)
+    self.assertEqual(1, cache.evictions)
+    cache.score(first, self.calculate)
+    self.assertEqual(3, len(self.calls))
+    cache.score(second, self.calculate)
+    self.assertEqual(4, len(self.calls))
+
+  def test_resizing(self):
+    cache = ScoreCache(3)
+    for offset in range(3): cache.score(self.board_with(('2', offset)), self.calculate)
+    cache.resize(1)
+    self.assertEqual(1, len(cache))
+    self.assertEqual(2, cache.evictions)
+
+  def test_matching_the_uncached_score(self):
+    board = self.board_with(('2', 0), ('3', 2), ('1', 4))
+    self.assertEqual(Referee.uncached(board), Referee.calculate(board))
+    self.assertEqual(Referee.uncached(board), Referee.calculate(board.copy(tiles=False)))
+
+if __name__ == '__main__': unittest.main()
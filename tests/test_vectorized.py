@@ -0,0 +1,66 @@
+import unittest
+import trix.config
+from trix import vectorized
+from trix.environment import Board, Environment
+from trix.game import Pieces, placements_for
+from trix.utilities import Referee
+from trix.agent import BeamSearchAgent
+
+@unittest.skipUnless(vectorized.available(), "NumPy is not installed")
+class TestVectorized(unittest.TestCase):
+
+  def setUp(self):
+    self.board = Board(6, tiles=False)
+    for name, offset in [('1', 0), ('2', 4), ('4', 1), ('7', 3)]:
+      self.board.place(placements_for(6).rotations[name][0].piece, offset)
+
+  def forked(self, action):
+    board = self.board.copy(tiles=False)
+    board.place(action.piece, action.left_offset)
+    return board
+
+  def test_matching_the_referee(self):
+    for name in Pieces:
+      actions = placements_for(6).place_next[name]
+      scores  = vectorized.scores(self.board, name)
+      self.assertEqual(len(actions), len(scores))
+      for action, score in zip(actions, scores.tolist()):
+        self.assertEqual(Referee.calculate(self.forked(action)), score)
+
+  def test_matching_the_board_statistics(self):
+    board = Board(4, tiles=False)
+    for name, offset in [('2', 0), ('5', 2), ('1', 0)]:
+      board.place(placements_for(4).rotations[name][0].piece, offset)
+    statistics = {'valleys': 'wells', 'holes': 'holes', 'covered_holes': 'covered_holes',
+                  'bumpiness': 'bumpiness', 'transitions': 'transitions', 'cleared': 'cleared'}
+    for name in Pieces:
+      values = vectorized.features(board, name)
+      for index, action in enumerate(placements_for(4).place_next[name]):
+        forked = board.copy(tiles=False)
+        forked.place(action.piece, action.left_offset)
+        for factor, attribute in statistics.items():
+          self.assertEqual(getattr(forked, attribute), values[factor][index], (name, index, factor))
+
+  def test_landing_and_clearing(self):
+    board = Board(4, tiles=False)
+    board.place(Pieces['2'], 0)
+    values  = vectorized.features(board, '1')
+    actions = placements_for(4).place_next['1']
+    # Upright I pieces land on the square or beside it, the flat one on top of it.
+    self.assertEqual([2, 2, 0, 0, 2], values['landing'].tolist())
+    self.assertEqual([a.left_offset for a in actions], [0, 1, 2, 3, 0])
+    self.assertEqual([0, 0, 0, 0, 1], (values['cleared'] - board.cleared).tolist())
+    self.assertEqual([6, 6, 4, 4, 2], values['maximum_height'].tolist())
+
+  def test_beam_search_is_unchanged(self):
+    config = trix.config.Configuration()
+    config.merge(trix.config.defaults)
+    config.buffer = 2
+    pieces = [Pieces[name] for name in '3516427153']
+    config.vectorize = True
+    vectorized_actions = BeamSearchAgent(Environment(config, pieces)).find_variation(Environment(config, pieces)).actions
+    config.vectorize = False
+    forked_actions = BeamSearchAgent(Environment(config, pieces)).find_variation(Environment(config, pieces)).actions
+    self.assertEqual(forked_actions, vectorized_actions)
+
+if __name__ == '__main__': unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import threading
+import unittest
+import trix.config
+from trix.environment import Piece, Board, Environment
+from trix import zobrist
+
+class TestZobrist(unittest.TestCase):
+
+  def setUp(self):
+    self.piece_a = Piece('1', ((0, 1, 0), (1, 1, 1)))
+    self.piece_b = Piece('2', ((1, 0), (1, 0), (1, 1)))
+    self.piece_c = Piece('3', ((1, 1, 1, 1),))
+    self.config  = trix.config.Configuration()
+    self.config.merge(trix.config.defaults)
+
+  def test_row_keys_combine_cell_keys(self):
+    self.assertEqual(0, zobrist.row(3, 0, 5))
+    self.assertEqual(zobrist.cell(2, 0) ^ zobrist.cell(2, 4), zobrist.row(2, 0b10001, 5))
+    self.assertNotEqual(zobrist.row(1, 0b10001, 5), zobrist.row(2, 0b10001, 5))
+
+  def test_keys_do_not_depend_on_the_order_they_are_asked_for(self):
+    def keys(order):
+      zobrist._cells.clear()
+      zobrist._buffer.clear()
+      found = {}
+      for kind, arguments in order: found[kind, arguments] = getattr(zobrist, kind)(*arguments)
+      return found
+    order = [('cell', (3, 2)), ('cell', (0, 5)), ('buffered', ('1', 1)), ('cell', (7, 10)), ('buffered', ('2', 3))]
+    self.assertEqual(keys(order), keys(list(reversed(order))))
+    self.assertEqual(5, len(set(keys(order).values())))
+
+  def test_growing_the_keys_from_many_threads(self):
+    zobrist._cells.clear()
+    def ask():
+      for level in range(4): zobrist.cell(level, 1999)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+      threads = [threading.Thread(target=ask) for thread in range(8)]
+      for thread in threads: thread.start()
+      for thread in threads: thread.join()
+    finally:
+      sys.setswitchinterval(interval)
+    self.assertEqual([2000] * 4, [len(keys) for keys in zobrist._cells])
+    self.assertEqual(8000, len({key for keys in zobrist._cells for key in keys}))
+
+  def test_empty_boards_hash_to_zero(self):
+    self.assertEqual(0, Board(11).zobrist)
+
+  def test_hash_is_independent_of_placement_order(self):
+    left, right = Board(11), Board(11)
+    left.place(self.piece_c, 0)
+    left.place(self.piece_b, 6)
+    right.place(self.piece_b, 6)
+    right.place(self.piece_c, 0)
+    self.assertEqual(left.rows, right.rows)
+    self.assertEqual(left.zobrist, right.zobrist)
+    self.assertEqual(left.calculated_zobrist(), left.zobrist)
+
+  def test_hash_is_updated_when_clearing_rows(self):
+    board = Board(5)
+    board.place(self.piece_c.rotate(), 4)
+    board.place(self.piece_b, 0)
+    board.place(self.piece_c, 0)
+    self.assertEqual(1, board.cleared)
+    self.assertEqual(board.calculated_zobrist(), board.zobrist)
+    self.assertNotEqual(0, board.zobrist)
+
+  def test_buffer_is_hashed_as_a_multiset(self):
+    self.config.buffer = 3
+    left  = Environment(self.config, [])
+    right = Environment(self.config, [])
+    left.add_to_buffer(self.piece_a)
+    left.add_to_buffer(self.piece_b)
+    left.add_to_buffer(self.piece_a)
+    right.add_to_buffer(self.piece_b)
+    right.add_to_buffer(self.piece_a)
+    self.assertNotEqual(left.zobrist, right.zobrist)
+    right.add_to_buffer(self.piece_a)
+    self.assertEqual(left.zobrist, right.zobrist)
+    left.remove_from_buffer(self.piece_a)
+    left.remove_from_buffer(self.piece_a)
+    left.remove_from_buffer(self.piece_b)
+    self.assertEqual(Environment(self.config, []).zobrist, left.zobrist)
+
+  def test_position_in_the_sequence_is_hashed(self):
+    env  = Environment(self.config, [self.piece_a, self.piece_b])
+    copy = env.copy()
+    self.assertEqual(env.zobrist, copy.zobrist)
+    copy.consume()
+    self.assertNotEqual(env.zobrist, copy.zobrist)
+    env.consume()
+    self.assertEqual(env.zobrist, copy.zobrist)
+
+if __name__ == '__main__': unittest.main()
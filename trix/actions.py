@@ -31,10 +31,10 @@ class AddToBuffer(Action):
 
 class PlacePiece(Action):
 
-  def __init__(self, piece, left_offset, original_piece):
+  def __init__(self, piece, left_offset, original_piece=None):
     self.piece          = piece
     self.left_offset    = left_offset
-    self.original_piece = original_piece
+    self.original_piece = piece if original_piece is None else original_piece
 
   def apply(self, environment):
     environment.place_piece_at(self.piece, self.left_offset)
@@ -47,7 +47,7 @@ class PlacePiece(Action):
     left         = self.left_offset
     right        = left + self.piece.width
     board        = environment.board
-    max_depth    = max(board.depth_for_row(i) for i in range(left, right))
+    max_depth    = board.height() - min(board.heights[left:right])
 
     return max(piece_height - max_depth, -piece_height)
 
@@ -63,11 +63,6 @@ class PlaceNextPiece(PlacePiece):
 
 class PlaceFromBuffer(PlacePiece):
 
-  def __init__(self, piece, left_offset, original_piece):
-    self.piece          = piece
-    self.left_offset    = left_offset
-    self.original_piece = original_piece
-
   def apply(self, environment):
     super().apply(environment)
     environment.remove_from_buffer(self.original_piece)
\ No newline at end of file
@@ -1,7 +1,15 @@
 from .actions import *
-from .game import Rotations
+from .game import placements_for
 from .utilities import Variation
-from .search import Node, AStar
+from .chain import Chain
+from . import vectorized
+from .search import Node, AStar, IDAStar, HDAStar, TranspositionTable, Frontiers
+from .metrics import MeteredFrontier
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from math import inf
+from time import perf_counter
+import heapq
 import random
 import sys
 
@@ -10,40 +18,77 @@ class Agent(object):
   def __init__(self, environment):
     self.environment = environment
     # Initialize stats.
+    self.visited     = 0
+    self.metrics     = None
+
+  def instrument(self, metrics):
+    "Records what the agent does for each piece in the given trix.metrics.Metrics."
+    self.metrics = metrics
 
   def process_choice(self, action, percept): pass
 
   def check_performance(self, action, percept): pass
 
   def run(self):
-    percept = percept = self.environment.perceive()
-    while percept:
-      action = self.choose_action(percept)
-      self.process_choice(action, percept)
-      self.environment.update(action)
-      self.check_performance(action, percept)
-      percept = self.environment.perceive()
+    environment = self.environment
+    percept     = environment.perceive()
+    metrics     = self.metrics
+    try:
+      # Once the pieces run out, turns go on without a percept until the buffer is empty.
+      while percept or environment.buffer:
+        if metrics is not None: metrics.start()
+        visited = self.visited
+        actions = self.take_turn(percept)
+        if metrics is not None: metrics.finish(placed_by(actions), self.visited - visited)
+        if actions is None: break
+        percept = environment.perceive()
+    finally:
+      self.close()
     self.render_history()
 
+  def take_turn(self, percept):
+    "Decides what to do about the percept and does it, returning the actions taken (None for nothing)."
+    action = self.choose_action(percept)
+    if action is None: return None
+    self.process_choice(action, percept)
+    self.environment.update(action)
+    self.check_performance(action, percept)
+    return [action]
+
+  def close(self): pass
+
   def choose_action(self, percept): raise NotImplementedError("You must implement choose_action in your agent")
 
   def render_history(self):
+    # A streaming environment has already written out each placement as it was made.
+    if self.environment.streaming: return
     with open(self.environment.configuration.output_file, 'w+') as f:
       for action in self.environment.history:
         rendered = action.render()
         if rendered: print(rendered, file=f)
 
+def placed_by(actions):
+  "The names of the pieces the actions place, in order."
+  return [action.piece.name for action in actions or () if isinstance(action, PlacePiece)]
+
 # Chooses a random pace to put the given piece.
 class RandomAgent(Agent):
 
   def choose_action(self, percept):
-    piece    = percept.piece
-    rotation = random.choice(list(piece.rotations()))
-    possible_offsets = self.environment.possible_left_offsets_for(rotation)
-    return PlaceNextPiece(rotation, random.choice(possible_offsets))
-
+    placements = placements_for(self.environment.board.width)
+    if percept is None: return random.choice(placements.place_from_buffer[self.environment.buffer[0].name])
+    return random.choice(placements.place_next[percept.piece.name])
+
+# Looks at every variation three actions ahead, breadth first. There are exponentially
+# many of them (tens of thousands a decision on a standard board), so like the search agent
+# it expands at most --nodes variations for each decision. The ones it doesn't get to
+# are compared as they are.
 class BruteForceAgent(Agent):
 
+  def __init__(self, environment):
+    super().__init__(environment)
+    self.nodes = environment.configuration.nodes
+
   def choose_action(self, percept):
     root_environment    = self.environment
     root_variation      = Variation(root_environment, -1, [])
@@ -52,9 +97,11 @@ class BruteForceAgent(Agent):
 
   def expand_variations(self, variations):
     to_expand = list(variations)
+    expanded  = 0
     while to_expand:
       candidate = to_expand.pop(0)
-      if self.should_explore_variation(candidate):
+      if expanded < self.nodes and self.should_explore_variation(candidate):
+        expanded += 1
         # We look at the alternative, but don't yield ourself. We only care about the best child.
         added = False
         for child in self.child_variations_for(candidate):
@@ -72,9 +119,10 @@ class BruteForceAgent(Agent):
     variations  = []
     environment = variation.environment
     percept     = environment.perceive()
-    if percept:
-      for action in self.possible_actions_for(environment, percept.piece):
+    if percept or environment.buffer:
+      for action in self.possible_actions_for(environment, percept.piece if percept else None):
         variations.append(variation.fork(action))
+    self.visited += len(variations)
     return variations
 
   def best_variation_from(self, variations):
@@ -91,17 +139,36 @@ class BruteForceAgent(Agent):
       return None
 
 
-  def possible_actions_for_piece(self, env, piece, klass):
-    # TODO: Use precomputed rotations.
-    for r in Rotations[piece.name]:
-      for i in env.possible_left_offsets_for(r):
-        yield klass(r, i)
-
   def possible_actions_for(self, env, piece):
-    if not env.buffer_is_full(): yield AddToBuffer(piece)
-    for action in self.possible_actions_for_piece(env, piece, PlaceNextPiece): yield action
+    # Once the pieces run out there are only the buffered ones to place.
+    placements = placements_for(env.board.width)
+    if piece is not None:
+      if not env.buffer_is_full(): yield placements.add_to_buffer[piece.name]
+      for action in placements.place_next[piece.name]: yield action
     for buffered_piece in env.buffer:
-      for action in self.possible_actions_for_piece(env, buffered_piece, PlaceFromBuffer): yield action
+      for action in placements.place_from_buffer[buffered_piece.name]: yield action
+
+# Every action the search agents consider from a given environment. These all come
+# straight out of the placement tables, so nothing is allocated per node.
+def successor_actions(env):
+  placements = placements_for(env.board.width)
+  # First, yield each of the pieces in the buffer (once, however many copies we hold).
+  seen = []
+  for piece in env.buffer:
+    if piece.name in seen: continue
+    seen.append(piece.name)
+    for action in placements.place_from_buffer[piece.name]: yield action
+  # Next, if there are any pieces as of yet processed - try placing the first.
+  items         = env.items
+  pending_items = len(items)
+  # Do nothing when there are zero items.
+  if pending_items < 1: return
+  next_piece = items[0]
+  for action in placements.place_next[next_piece.name]: yield action
+  # When the buffer is not full and we have more than one item (if there is less than one item, don't even
+  # bother placing it).
+  if pending_items > 1 and not env.buffer_is_full():
+    yield placements.add_to_buffer[next_piece.name]
 
 class Tracker(object):
 
@@ -111,6 +178,8 @@ class Tracker(object):
     self.max_nodes    = max_nodes
     self.max_depth    = 0
     self.cutoff_depth = cutoff_depth
+    # When a list, every variation visited goes in it, not just the best for each height.
+    self.variations   = None
 
   def should_cutoff_after(self, variation):
     return self.visited >= self.max_nodes or variation.number_of_actions >= self.cutoff_depth
@@ -122,6 +191,7 @@ class Tracker(object):
     self.visited += 1
     self.max_depth = max(self.max_depth, variation.number_of_actions)
     self.update_history(variation)
+    if self.variations is not None: self.variations.append(variation)
 
   def update_history(self, variation):
     history   = self.history
@@ -131,10 +201,28 @@ class Tracker(object):
     if version not in history or history[version].priority_score > variation.priority_score:
       history[version] = variation
 
+class MeteredTracker(Tracker):
+  "A Tracker that also counts the nodes cut off and times scoring in the given Metrics."
+
+  def __init__(self, history, cutoff_depth, metrics):
+    super().__init__(history, cutoff_depth)
+    self.metrics = metrics
+
+  def should_cutoff_after(self, variation):
+    cutoff = super().should_cutoff_after(variation)
+    if cutoff: self.metrics.pruned += 1
+    return cutoff
+
+  def update_history(self, variation):
+    # Boards are only scored when the history has another variation of the same height
+    # to compare them with, so that's where the time goes.
+    started = perf_counter()
+    super().update_history(variation)
+    self.metrics.phases['score'] += perf_counter() - started
 
 class MinimalSearchNode(Node):
 
-  def __init__(self, base_variation, action, tracker, goal_height=0, root_node=False):
+  def __init__(self, base_variation, action, tracker, goal_height=0, root_node=False, root_actions=None):
     environment = base_variation.environment
     # The actual cost is the current boards height.
     super().__init__(environment.board.height())
@@ -144,6 +232,7 @@ class MinimalSearchNode(Node):
     self.tracker      = tracker
     self.goal_height  = goal_height
     self.root_node    = root_node
+    self.root_actions = root_actions
     self._variation   = None
 
   def variation(self):
@@ -160,9 +249,6 @@ class MinimalSearchNode(Node):
     # object, e.g. it's the optimal change in height.
     return self.action.heuristic_cost_on(self.environment)
 
-  def __lt__(self, other):
-    return self.base_variation.number_of_actions < other.base_variation.number_of_actions
-
   def visit(self):
     if not self.root_node:
       self.tracker.visit(self.variation())
@@ -173,27 +259,16 @@ class MinimalSearchNode(Node):
   def is_goal(self):
     return not self.root_node and self.variation().height == self.goal_height
 
-  def possible_actions_for_piece(self, env, piece, klass):
-    # TODO: Use precomputed rotations.
-    for r in Rotations[piece.name]:
-      for i in env.possible_left_offsets_for(r):
-        yield klass(r, i, piece)
+  def state_key(self):
+    return self.variation().environment.zobrist
+
+  def path_cost(self):
+    return self.variation().number_of_actions
 
   def child_actions(self):
-    env = self.variation().environment
-    # First, yield each of the pieces in the buffer.
-    for piece in env.buffer:
-      for action in self.possible_actions_for_piece(env, piece, PlaceFromBuffer): yield action
-    # Next, if there are any pieces as of yet processed - try placing the first.
-    pending_items = len(env.items)
-    # Do nothing when there are zero items.
-    if pending_items < 1: return
-    next_piece = env.items[0]
-    for action in self.possible_actions_for_piece(env, next_piece, PlaceNextPiece): yield action
-    # When the buffer is not full and we have more than one item (if there is less than one item, don't even
-    # bother placing it).
-    if pending_items > 1 and not env.buffer_is_full():
-      yield AddToBuffer(next_piece)
+    # A root can be limited to some of its actions, to split a search between processes.
+    if self.root_actions is not None: return self.root_actions
+    return successor_actions(self.variation().environment)
 
   def children(self):
     base_variation = self.variation()
@@ -203,28 +278,278 @@ class MinimalSearchNode(Node):
     for action in self.child_actions():
       yield self.__class__(base_variation, action, tracker, goal_height)
 
+  def child(self, index):
+    # Only the one variation is forked.
+    action = next(islice(self.child_actions(), index, None))
+    return self.__class__(self.variation(), action, self.tracker, self.goal_height)
+
+class MeteredSearchNode(MinimalSearchNode):
+  "A MinimalSearchNode that counts and times its forks and children in its MeteredTracker's metrics."
+
+  def variation(self):
+    if self._variation is not None or self.root_node: return super().variation()
+    started   = perf_counter()
+    variation = super().variation()
+    self.tracker.metrics.phases['fork'] += perf_counter() - started
+    return variation
+
+  def children(self):
+    metrics  = self.tracker.metrics
+    started  = perf_counter()
+    children = list(super().children())
+    metrics.phases['successors'] += perf_counter() - started
+    metrics.expanded  += 1
+    metrics.generated += len(children)
+    return children
+
+class Rebase(object):
+  """
+  Moves the variations found under a committed variation onto a root at its end, dropping
+  the committed actions from the front of each (and keeping their scores). Those that
+  don't start with the committed actions come back as None. Variations share their chains
+  and searches share their base variations, so each is only rebased once.
+  """
+
+  def __init__(self, committed):
+    self.length     = committed.number_of_actions
+    self.chains     = {committed.chain: Chain()}
+    self.variations = {}
+
+  def chain(self, chain):
+    chains = self.chains
+    links  = []
+    while chain not in chains:
+      if chain.length <= self.length:
+        # Another branch: none of the links on the way here are under the committed one.
+        chains[chain] = None
+        break
+      links.append(chain)
+      chain = chain.parent
+    rebased = chains[chain]
+    for link in reversed(links):
+      rebased = chains[link] = rebased.append(link.value) if rebased is not None else None
+    return rebased
+
+  def variation(self, variation):
+    if variation in self.variations: return self.variations[variation]
+    chain = self.chain(variation.chain)
+    if chain is None:
+      rebased = None
+    else:
+      rebased = Variation(variation.environment, chain.length - 1, chain)
+      rebased._utility = variation._utility
+    self.variations[variation] = rebased
+    return rebased
+
 class MinimalSearchAgent(Agent):
 
   node_class = MinimalSearchNode
 
-  def search_for_variation_to_height(self, environment, history, target_height, cutoff_depth):
+  def __init__(self, environment):
+    super().__init__(environment)
+    configuration = environment.configuration
+    self.frontier = Frontiers[configuration.frontier]
+    self.engine   = configuration.search
+    self.ceiling  = configuration.ceiling
+    self.nodes    = configuration.nodes
+    self.jobs     = configuration.jobs
+    self.parallel = configuration.parallel
+    self.reuse    = configuration.reuse
+    # Time limits in seconds, for each decision and for the whole game (see deadline_for).
+    self.time_per_piece = configuration.time_per_piece
+    self.time_budget    = configuration.time_budget
+    self.spent          = 0.0
+    self.pool     = None
+    self.hda      = None
+    # The last search and its tracker, and the variation committed since (see seed).
+    self.previous  = None
+    self.committed = None
+    if configuration.table_size > 0:
+      self.table = TranspositionTable(configuration.table_size, configuration.table_policy)
+    else:
+      self.table = None
+
+  def instrument(self, metrics):
+    super().instrument(metrics)
+    # Searches split between processes can't report back from them, so only the time
+    # and nodes visited for each piece are recorded for those.
+    if self.jobs > 1: return
+    frontier        = self.frontier
+    self.node_class = MeteredSearchNode
+    self.frontier   = lambda: MeteredFrontier(frontier(), metrics)
+
+  def tracker_for(self, history, cutoff_depth):
+    if self.metrics is None: return Tracker(history, cutoff_depth)
+    return MeteredTracker(history, cutoff_depth, self.metrics)
+
+  def table_counts(self):
+    table = self.table
+    return (table.hits, table.misses) if table is not None else (0, 0)
+
+  def count_table(self, counted):
+    # What the transposition table did in a search, given its table_counts() before it.
+    if self.metrics is None or self.table is None: return
+    hits, misses = counted
+    self.metrics.deduplicated += self.table.hits - hits
+    self.metrics.admitted     += self.table.misses - misses
+
+  def search_for_variation_to_height(self, environment, history, target_height, cutoff_depth, root_actions=None, nodes=None):
     root_variation = Variation(environment, -1, [])
-    tracker        = Tracker(history, cutoff_depth)
-    root_node      = self.node_class(root_variation, None, tracker, target_height, root_node=True)
-    result         = AStar(root_node).search()
+    tracker        = self.tracker_for(history, cutoff_depth)
+    root_node      = self.node_class(root_variation, None, tracker, target_height, root_node=True, root_actions=root_actions)
+    # States are only comparable within one search, as the costs are relative to its root.
+    if self.table is not None: self.table.clear()
+    counted        = self.table_counts()
+    search         = self.search_from(root_node, self.nodes if nodes is None else nodes)
+    reusing        = self.reuse and root_actions is None and environment is self.environment and isinstance(search, AStar)
+    if reusing:
+      if self.previous is not None and self.committed is not None: self.seed(search, tracker, target_height)
+      search.set_aside   = []
+      tracker.variations = []
+    result         = search.search()
+    self.previous  = (search, tracker) if reusing else None
+    self.committed = None
+    self.visited  += tracker.visited
+    self.count_table(counted)
     if result:
       return result.variation()
     else:
       # DO NOTHING.
       return None
 
+  def deepening_search_for_variation_to_height(self, environment, history, target_height, deadline):
+    # An anytime search: A* cut off one action deeper each time round, with as many
+    # nodes as it likes until the deadline. Every pass records what it visits in the same
+    # history, so when it stops the best variation found so far is there to fall back on.
+    # The first pass always runs to the end so that there is one, and deepening stops
+    # early at a goal or once a pass cuts nothing off, as going deeper would find nothing new.
+    depth = 1
+    while True:
+      tracker           = self.tracker_for(history, depth)
+      tracker.max_nodes = inf
+      root_node         = self.node_class(Variation(environment, -1, []), None, tracker, target_height, root_node=True)
+      if self.table is not None: self.table.clear()
+      counted           = self.table_counts()
+      search            = self.search_from(root_node, inf)
+      search.deadline   = deadline if depth > 1 else None
+      result            = search.search()
+      self.visited     += tracker.visited
+      self.count_table(counted)
+      if result: return result.variation()
+      if search.expired or tracker.max_depth < depth or perf_counter() >= deadline: return None
+      depth += 1
+
+  def deadline_for(self, environment):
+    "The perf_counter() time the next decision has to be made by, or None without a time limit."
+    allowed = self.time_per_piece
+    if self.time_budget is not None:
+      # What's left of the budget, shared out evenly between the pieces still to place.
+      remaining = max(len(environment.items) + len(environment.buffer), 1)
+      share     = max(self.time_budget - self.spent, 0.0) / remaining
+      allowed   = share if allowed is None else min(allowed, share)
+    return None if allowed is None else perf_counter() + allowed
+
+  def seed(self, search, tracker, goal_height):
+    # Picks up where the last search left off. Everything it found under the variation
+    # committed since is still good, moved onto the new root: the variations it visited
+    # go into the history, the states it expanded into the table (path costs drop by
+    # the actions committed, just as the chains do), and the nodes it left open - along
+    # with those it set aside as duplicates or at the old cutoff depth, which is now
+    # further away - become the frontier.
+    previous, previous_tracker = self.previous
+    rebase = Rebase(self.committed)
+    table  = self.table
+    aside  = {node._variation for node in previous.set_aside}
+    for variation in previous_tracker.variations:
+      rebased = rebase.variation(variation)
+      if rebased is None or not rebased.number_of_actions: continue
+      tracker.update_history(rebased)
+      if table is not None and variation not in aside: table.admit(rebased.environment.zobrist, rebased.number_of_actions)
+    seeded = []
+    left   = list(previous.frontier) + [(node.estimated_cost(), node) for node in previous.set_aside]
+    for priority, node in left:
+      base = rebase.variation(node.base_variation)
+      if base is None: continue
+      seed = self.node_class(base, node.action, tracker, goal_height)
+      if node._variation is not None: seed._variation = rebase.variation(node._variation)
+      seeded.append((priority, seed))
+    # Nothing was found under it when it wasn't expanded, so the search starts from the root.
+    if not seeded: return
+    search.frontier = self.frontier()
+    for priority, node in seeded: search.frontier.push(priority, node)
+
+  def search_from(self, root_node, nodes):
+    if self.engine == 'ida':
+      search = IDAStar(root_node, self.table, self.ceiling)
+    else:
+      search = AStar(root_node, self.table, self.frontier)
+    search.maximum = nodes
+    return search
+
+  def parallel_search_for_variation_to_height(self, environment, history, target_height, cutoff_depth):
+    # Root parallel search: the actions from the root are dealt out between the jobs, each
+    # of which searches its share of the subtrees with its share of the node budget in
+    # another process. The variations they find come back as paths (see path_to) and
+    # are merged into the history just as a single search would have recorded them.
+    if self.pool is None: self.pool = ProcessPoolExecutor(self.jobs)
+    actions  = list(successor_actions(environment))
+    detached = environment.detached(cutoff_depth + 1)
+    jobs     = min(self.jobs, len(actions))
+    nodes    = -(-self.nodes // jobs) if jobs else 0
+    futures  = [self.pool.submit(search_subtree, detached, tuple(range(job, len(actions), jobs)), target_height, cutoff_depth, nodes)
+                for job in range(jobs)]
+    tracker  = Tracker(history, cutoff_depth)
+    goals    = []
+    for future in futures:
+      goal, paths, visited = future.result()
+      self.visited += visited
+      for path in paths: tracker.update_history(variation_along(environment, path))
+      if goal is not None: goals.append(variation_along(environment, goal))
+    if goals:
+      return min(goals, key=lambda variation: variation.priority_score)
+    return None
+
+  def hash_distributed_search_for_variation_to_height(self, environment, history, target_height, cutoff_depth):
+    # See HDAStar. Each worker's tracker records the best variations it sees, which come
+    # back as paths and are merged into the history as for the root parallel search.
+    # Only used when the configuration's parallel is 'hda'. The runner doesn't offer it
+    # until it's been shown to beat the root parallel search on more than one core.
+    if self.hda is None:
+      configuration = self.environment.configuration
+      self.hda = HDAStar(self.jobs, configuration.table_size, configuration.table_policy, self.frontier, report=tracker_report)
+    detached  = environment.detached(cutoff_depth + 1)
+    root_node = self.node_class(Variation(detached, -1, []), None, Tracker({}, cutoff_depth), target_height, root_node=True)
+    goal, reports = self.hda.search(root_node, self.nodes)
+    tracker = Tracker(history, cutoff_depth)
+    for visited, paths in reports:
+      self.visited += visited
+      for path in paths: tracker.update_history(variation_along(environment, path))
+    return variation_along(environment, goal) if goal is not None else None
+
+  def close(self):
+    if self.pool is not None:
+      self.pool.shutdown()
+      self.pool = None
+    if self.hda is not None:
+      self.hda.close()
+      self.hda = None
+
   def find_variation(self, environment, percept):
     # TODO: Improve the maximum chain length for a given item.
     max_chain_length = max(environment.configuration.buffer * 2, 3)
-    max_height       = environment.board.height() + percept.piece.height
     history          = {}
-
-    variation = self.search_for_variation_to_height(environment, history, 0, max_chain_length)
+    started          = perf_counter()
+    deadline         = self.deadline_for(environment)
+
+    if deadline is not None:
+      variation = self.deepening_search_for_variation_to_height(environment, history, 0, deadline)
+    elif self.jobs > 1 and self.parallel == 'hda':
+      variation = self.hash_distributed_search_for_variation_to_height(environment, history, 0, max_chain_length)
+    elif self.jobs > 1:
+      variation = self.parallel_search_for_variation_to_height(environment, history, 0, max_chain_length)
+    else:
+      variation = self.search_for_variation_to_height(environment, history, 0, max_chain_length)
+    self.spent += perf_counter() - started
 
     if variation:
       return variation
@@ -233,24 +558,111 @@ class MinimalSearchAgent(Agent):
     else:
       return None
 
-  def run(self):
+  def take_turn(self, percept):
     environment = self.environment
-    percept = environment.perceive()
-    while percept:
-      variation = self.find_variation(environment, percept)
-      if variation is None:
-        print("Nothing to do?")
-        break
-      else:
-        for action in variation.actions:
-          environment.update(action)
-      percept = environment.perceive()
-    self.render_history()
+    variation   = self.find_variation(environment, percept)
+    if variation is None:
+      # Not on stdout, which can be where the moves are going (see --stream).
+      print("Nothing to do?", file=sys.stderr)
+      return None
+    actions = variation.actions
+    for action in actions:
+      environment.update(action)
+    self.committed = variation
+    return actions
+
+# Actions are shared flyweights (see trix.game), so rather than pickling them between
+# processes we send the position of each in successor_actions() along the variation.
+def path_to(environment, actions):
+  path = []
+  for action in actions:
+    path.append(next(index for index, successor in enumerate(successor_actions(environment)) if successor is action))
+    environment = environment.fork(action)
+  return tuple(path)
+
+def variation_along(environment, path):
+  variation = Variation(environment, -1, [])
+  for index in path:
+    variation = variation.fork(list(successor_actions(variation.environment))[index])
+  return variation
+
+# Runs in each HDAStar worker once a search is done, reporting how many nodes its tracker
+# saw and the best variation at each height among them, as paths from the root.
+def tracker_report(root_node):
+  environment, tracker = root_node.environment, root_node.tracker
+  return tracker.visited, [path_to(environment, variation.actions) for variation in tracker.history.values()]
+
+# Runs in a worker process for MinimalSearchAgent.parallel_search_for_variation_to_height,
+# searching the subtrees under the given root actions (by index). Returns the path to the
+# goal found, if any, the paths to the best variation at each height on the way and the
+# number of nodes visited.
+def search_subtree(environment, indices, target_height, cutoff_depth, nodes):
+  agent     = MinimalSearchAgent(environment)
+  actions   = list(successor_actions(environment))
+  history   = {}
+  variation = agent.search_for_variation_to_height(environment, history, target_height, cutoff_depth, [actions[index] for index in indices], nodes)
+  goal      = path_to(environment, variation.actions) if variation else None
+  return goal, [path_to(environment, visited.actions) for visited in history.values()], agent.visited
+
+# Looks a fixed number of actions ahead, only keeping the best few variations (by their
+# Referee score) at each depth. Every decision costs at most width * depth expansions,
+# so the time and memory per piece are bounded whatever the board looks like.
+#
+# When NumPy is available, every placement from a variation is scored in one batch
+# (see trix.vectorized) and only the variations that make it into the beam are forked.
+class BeamSearchAgent(Agent):
+
+  def __init__(self, environment):
+    super().__init__(environment)
+    configuration   = environment.configuration
+    self.width      = configuration.beam_width
+    self.depth      = configuration.beam_depth
+    self.vectorized = configuration.vectorize and vectorized.available(configuration.width)
 
+  def choose_action(self, percept):
+    variation = self.find_variation(self.environment)
+    return variation.root_action
+
+  def find_variation(self, environment):
+    beam     = [Variation(environment, -1, [])]
+    finished = []
+    for depth in range(self.depth):
+      candidates = []
+      for variation in beam:
+        children = self.scored_children(variation)
+        self.visited += len(children)
+        # Variations that have run out of pieces can't go any deeper, but still compete.
+        if children: candidates.extend(children)
+        elif variation.number_of_actions: finished.append(variation)
+      if not candidates: break
+      survivors = heapq.nsmallest(self.width, candidates, key=lambda candidate: candidate[0])
+      beam      = [child or parent.fork(action) for score, parent, action, child in survivors]
+    return min(beam + finished, key=lambda variation: variation.utility)
+
+  def scored_children(self, variation):
+    "(score, parent, action, child) for each successor, where child is None if it isn't forked yet."
+    environment = variation.environment
+    actions     = list(successor_actions(environment))
+    if not self.vectorized:
+      children = [variation.fork(action) for action in actions]
+      return [(child.utility, variation, action, child) for action, child in zip(actions, children)]
+    board      = environment.board
+    placements = placements_for(board.width)
+    names      = set(piece.name for piece in environment.buffer)
+    items      = environment.items
+    if items: names.add(items[0].name)
+    scores     = {}
+    for name in names:
+      values = vectorized.scores(board, name).tolist()
+      scores.update(zip(placements.place_next[name], values))
+      scores.update(zip(placements.place_from_buffer[name], values))
+    # Buffering a piece leaves the board as it is.
+    return [(scores.get(action, variation.utility), variation, action, None) for action in actions]
 
 Agents = {
   'default': MinimalSearchAgent,
   'search':  MinimalSearchAgent,
+  'beam':    BeamSearchAgent,
   'bfs':     BruteForceAgent,
   'random':  RandomAgent
 }
@@ -0,0 +1,80 @@
+# Plays many games - every input file under every combination of agent, width and buffer
+# size given - across a pool of processes, so each worker interpreter starts once and
+# plays many games. The moves for each game go to their own file in the output directory,
+# and a summary of every game is printed and written alongside them.
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from .config import defaults, Configuration
+from . import runner
+import trix.agent
+
+def listed(kind):
+  "Parses a comma separated list of values of the given kind."
+  return lambda value: [kind(item) for item in value.split(',')]
+
+parser = argparse.ArgumentParser(description="Plays many games of trix in parallel")
+parser.add_argument('-a', '--agents', dest='agents', help='The agents to play each game with, comma separated', default=[defaults.agent], type=listed(str))
+parser.add_argument('-w', '--widths', dest='widths', help='The board widths to play each game with, comma separated', default=[defaults.width], type=listed(int))
+parser.add_argument('-b', '--buffers', dest='buffers', help='The buffer sizes to play each game with, comma separated', default=[defaults.buffer], type=listed(int))
+parser.add_argument('-j', '--jobs', dest='jobs', help='The number of games to play at once', default=os.cpu_count(), type=int)
+parser.add_argument('-o', '--output-dir', dest='output_dir', help='The directory to write the moves for each game and the summary to', default='out')
+parser.add_argument('--summary', dest='summary', help='The file to write the summary to (defaults to summary.txt in the output directory)')
+parser.add_argument('input_files', help='The files to read the pieces for each game from', nargs='+')
+
+Columns = ['input', 'agent', 'width', 'buffer', 'seconds', 'nodes', 'height', 'max height', 'holes', 'cleared']
+
+def labels(input_files):
+  "The name of each input file, numbered by its place in the list when another input has the same one."
+  names = [os.path.basename(input_file) for input_file in input_files]
+  return [name if names.count(name) == 1 else "%s.%d" % (name, index + 1) for index, name in enumerate(names)]
+
+def games(input_files, agents, widths, buffers, output_dir):
+  "The configuration for each game in the grid."
+  inputs = zip(input_files, labels(input_files))
+  for (input_file, label), agent, width, buffer in product(inputs, agents, widths, buffers):
+    if agent not in trix.agent.ValidAgents:
+      raise ValueError("Unknown agent %r, expected one of %s" % (agent, ", ".join(trix.agent.ValidAgents)))
+    name          = "%s.%s.w%d.b%d" % (label, agent, width, buffer)
+    configuration = Configuration()
+    configuration.merge(defaults)
+    configuration.agent       = agent
+    configuration.width       = width
+    configuration.buffer      = buffer
+    configuration.input_file  = input_file
+    configuration.output_file = os.path.join(output_dir, name)
+    yield configuration
+
+def play(configuration):
+  "Plays one game, returning its row of the summary."
+  started = time.perf_counter()
+  agent   = runner.play(configuration)
+  elapsed = time.perf_counter() - started
+  board   = agent.environment.board
+  return [configuration.input_file, configuration.agent, configuration.width, configuration.buffer,
+          "%.2f" % elapsed, agent.visited, board.height(), board.maximum_height, board.holes, board.cleared]
+
+def summarise(rows):
+  "Lays the rows out as a table, with a column for each of Columns."
+  table  = [Columns] + [[str(value) for value in row] for row in rows]
+  widths = [max(len(row[index]) for row in table) for index in range(len(Columns))]
+  lines  = ["  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip() for row in table]
+  return "\n".join(lines)
+
+def main(argv):
+  arguments = parser.parse_args(argv[1:])
+  os.makedirs(arguments.output_dir, exist_ok=True)
+  configurations = list(games(arguments.input_files, arguments.agents, arguments.widths, arguments.buffers, arguments.output_dir))
+  with ProcessPoolExecutor(max(arguments.jobs, 1)) as pool:
+    rows = list(pool.map(play, configurations))
+  summary = summarise(rows)
+  with open(arguments.summary or os.path.join(arguments.output_dir, 'summary.txt'), 'w') as f:
+    print(summary, file=f)
+  print(summary)
+
+if __name__ == '__main__':
+  import sys
+  main(sys.argv)
@@ -0,0 +1,45 @@
+# A persistent list of values built up one at a time. Appending returns a new chain
+# that points back at the one it was appended to, so every fork of a history or a
+# variation shares all of its earlier entries and only allocates the new link. The
+# values are only laid out as a list when something actually needs to walk them.
+class Chain(object):
+
+  __slots__ = ['value', 'parent', 'length']
+
+  @classmethod
+  def from_list(klass, values):
+    chain = klass()
+    for value in values: chain = chain.append(value)
+    return chain
+
+  def __init__(self, value=None, parent=None):
+    self.value  = value
+    self.parent = parent
+    self.length = 0 if parent is None else parent.length + 1
+
+  def append(self, value):
+    return Chain(value, self)
+
+  def first(self):
+    if not self.length:
+      raise IndexError("first() called on an empty chain")
+    link = self
+    while link.length > 1: link = link.parent
+    return link.value
+
+  def to_list(self):
+    values = [None] * self.length
+    link   = self
+    while link.length:
+      values[link.length - 1] = link.value
+      link = link.parent
+    return values
+
+  def __len__(self):
+    return self.length
+
+  def __iter__(self):
+    return iter(self.to_list())
+
+  def __repr__(self):
+    return "<Chain length=%d>" % self.length
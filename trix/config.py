@@ -13,4 +13,4 @@ class Configuration:
       information = " ".join(["%s=%r" % (k, data[k]) for k in data])
       return "<trix.config.Configuration %s>" % information
 
-defaults = Configuration(width=11, buffer=1, input_file=None, output_file=None, agent='default')
\ No newline at end of file
+defaults = Configuration(width=11, buffer=1, input_file=None, output_file=None, agent='default', table_size=50000, table_policy='lru', frontier='bucket', beam_width=8, beam_depth=3, vectorize=True, search='astar', ceiling=10000, score_cache=50000, nodes=200, jobs=1, parallel='root', metrics=None, profile=None, stream=False, reuse=False, time_per_piece=None, time_budget=None)
\ No newline at end of file
@@ -1,4 +1,11 @@
 from .percept import Percept
+from .chain import Chain
+from . import zobrist
+from collections import deque
+from functools import partial
+
+# Higher than any column, so the walls never make a well shallower.
+Wall = 1 << 62
 
 class Generation(object):
 
@@ -11,7 +18,7 @@ class Generation(object):
 
 class Piece(object):
 
-  __slots__ = ['name', 'shape', 'width', 'height', 'bit_masks', 'rotation']
+  __slots__ = ['name', 'shape', 'width', 'height', 'bit_masks', 'bottom', 'top', 'cells', 'rotation']
 
   def __init__(self, name, shape, rotation=0):
     self.name     = name
@@ -20,6 +27,7 @@ class Piece(object):
     self.height   = len(shape)
     self.rotation = rotation
     self._calculate_bit_masks()
+    self._calculate_profiles()
 
   def rotations(self):
     rotations = [self]
@@ -50,6 +58,19 @@ class Piece(object):
       for entry in row: bit_mask = (bit_mask << 1) + entry
       bit_masks.append(bit_mask)
     self.bit_masks = bit_masks
+    self.cells     = sum(bit_mask.bit_count() for bit_mask in bit_masks)
+
+  # For each column, the level (counting up from the bottom row of the piece) of the
+  # lowest and the highest filled cell. Together with the column heights on the board,
+  # these tell us where the piece lands without probing row by row.
+  def _calculate_profiles(self):
+    bottom, top = [], []
+    for x in range(self.width):
+      levels = [self.height - y - 1 for y in range(self.height) if self.shape[y][x]]
+      bottom.append(min(levels))
+      top.append(max(levels))
+    self.bottom = tuple(bottom)
+    self.top    = tuple(top)
 
   def __repr__(self):
     return "<Piece: name=%s size=(%d,%d) shape=%s>" % (self.name, self.width, self.height, self.shape)
@@ -88,7 +109,7 @@ class Row(object):
     return self.tiles[index] is None;
 
   def calculated_holes(self):
-    return sum(1 if self.tiles[index] is None else 0 for index in range(self.width))
+    return self.width - self.content.bit_count()
 
   def can_place(self, piece, piece_row, left_offset):
     # First, we know it must fit within the bounds of the row.
@@ -116,145 +137,419 @@ class Row(object):
     adjusted_bit_mask = bit_mask << shift_amount
     return adjusted_bit_mask
 
-# The board is modelled as a collection of rows, with the
-# most recently added at the top. We model it like this so we can effectively
+# The number of changes between filled and empty cells along a row, with the walls on
+# either side counting as filled. An empty row has two and a full row none.
+def row_transitions(content, width):
+  bounded = (content << 1) | 1 | (1 << (width + 1))
+  return ((bounded ^ (bounded >> 1)) & ((2 << width) - 1)).bit_count()
+
+# Counting transitions is on the path of every placement, so boards narrow enough for
+# it to be cheap look them up in a table of every possible row instead.
+TabulatedWidth   = 16
+_row_transitions = {}
+
+def row_transitions_for(width):
+  if width not in _row_transitions:
+    if width <= TabulatedWidth:
+      table = tuple(row_transitions(content, width) for content in range(2 << (width - 1)))
+      _row_transitions[width] = table.__getitem__
+    else:
+      _row_transitions[width] = partial(row_transitions, width=width)
+  return _row_transitions[width]
+
+# The bumpiness - the sum of the height differences between neighbouring columns - and
+# the total depth of the wells - the columns lower than both their neighbours, where a
+# wall counts as higher than any column - of the skyline over the columns in [start, stop).
+def surface(heights, start, stop):
+  last, bumpiness, wells = len(heights) - 1, 0, 0
+  if not last: return 0, 0
+  for i in range(start, stop):
+    column = heights[i]
+    left   = heights[i - 1] if i else Wall
+    right  = heights[i + 1] if i < last else Wall
+    if i + 1 < stop: bumpiness += column - right if column > right else right - column
+    rim = left if left < right else right
+    if rim > column: wells += rim - column
+  return bumpiness, wells
+
+# The board is modelled as an immutable tuple of row bit masks, with the
+# most recently added at the top. Since the masks are plain ints and the tuple
+# is never mutated in place, copying a board is just sharing the tuple - this is
+# what the search relies on when it forks environments.
+#
+# Alongside the rows we keep the skyline - the height of each column - which is
+# updated as pieces are placed and rows are cleared. It lets us find where a piece
+# lands and how deep each column is without scanning the rows. The same goes for
+# the Zobrist hash of the board contents (see trix.zobrist).
+#
+# The per-cell piece attribution (which piece filled which tile) is only needed
+# to render the board, so it lives in a separate layer of Row objects that is
+# only maintained for the committed game - copies made for the search skip it.
+#
+# The statistics the Referee scores (see trix.utilities) are kept up to date as we
+# go rather than recomputed: the number of filled cells and the row transitions are
+# adjusted for the rows a piece touches, and the skyline statistics - bumpiness,
+# wells and covered holes - for the columns around it. Only clearing rows, which
+# moves every column, recomputes the skyline statistics from scratch.
 class Board(object):
 
-  __slots__ = ['width', 'rows', 'cleared', 'maximum_height', 'holes']
+  __slots__ = ['width', 'maximum', 'rows', 'heights', 'tiles', 'cleared', 'maximum_height', 'holes', 'zobrist',
+               'filled', 'covered_holes', 'transitions', 'bumpiness', 'wells']
 
-  def __init__(self, width):
+  def __init__(self, width, tiles=True):
     self.width          = width
-    self.rows           = []
+    self.maximum        = (2 << (width - 1)) - 1
+    self.rows           = ()
+    self.heights        = (0,) * width
+    self.tiles          = [] if tiles else None
     self.cleared        = 0
     self.maximum_height = 0
     self.holes          = 0
-
-  def copy(self):
+    self.zobrist        = 0
+    self.filled         = 0
+    self.covered_holes  = 0
+    self.transitions    = 0
+    self.bumpiness      = 0
+    self.wells          = 0
+
+  def copy(self, tiles=True):
     instance                = object.__new__(Board)
     instance.width          = self.width
-    instance.rows           = [row.copy() for row in self.rows]
+    instance.maximum        = self.maximum
+    instance.rows           = self.rows
+    instance.heights        = self.heights
     instance.cleared        = self.cleared
     instance.maximum_height = self.maximum_height
     instance.holes          = self.holes
+    instance.zobrist        = self.zobrist
+    instance.filled         = self.filled
+    instance.covered_holes  = self.covered_holes
+    instance.transitions    = self.transitions
+    instance.bumpiness      = self.bumpiness
+    instance.wells          = self.wells
+    if tiles and self.tiles is not None:
+      instance.tiles = [row.copy() for row in self.tiles]
+    else:
+      instance.tiles = None
     return instance
 
   def render(self):
     line = "+" + ("-" * self.width) + "+"
-    inner = "\n".join("|" + row.render() + "|" for row in self.rows)
+    if self.tiles is None:
+      inner = "\n".join("|" + self._render_mask(row) + "|" for row in self.rows)
+    else:
+      inner = "\n".join("|" + row.render() + "|" for row in self.tiles)
     return "\n".join([line, inner, line])
 
   def height(self):
     return len(self.rows)
 
   def calculated_holes(self):
-    return sum(row.holes for row in self.rows)
+    return (self.width * len(self.rows)) - sum(row.bit_count() for row in self.rows)
+
+  def calculated_covered_holes(self):
+    return sum(self.heights) - sum(row.bit_count() for row in self.rows)
+
+  def calculated_transitions(self):
+    return sum(row_transitions(row, self.width) for row in self.rows)
+
+  # Everything the Referee scores follows from the width, the rows, the rows cleared and
+  # the highest the board has been, so this identifies a board as far as scoring goes.
+  def fingerprint(self):
+    return (self.zobrist, self.width, len(self.rows), self.cleared, self.maximum_height)
+
+  def calculated_zobrist(self):
+    height, width = len(self.rows), self.width
+    key = 0
+    for index, row in enumerate(self.rows): key ^= zobrist.row(height - index - 1, row, width)
+    return key
 
     # The starting row for the bottom of the piece.
   def place(self, piece, left_offset):
-    bottom_row  = self._row_for_bottom(piece, left_offset)
+    level       = self._landing_level(piece, left_offset)
+    bottom_row  = self.height() - level - 1
     top_row     = bottom_row - piece.height + 1
+    self._raise_heights(piece, left_offset, level)
     # We need to adjust when it doesn't quite fit in the row.
     if top_row < 0:
       for i in range(-top_row): self._prepend_empty_row()
       top_row = 0
-    # Now, we iterate over the rows and place.
-    for i in range(piece.height):
-      self.rows[top_row + i].place(piece, i, left_offset)
+    # Now, we build the new masks for the rows the piece touches.
+    rows   = self.rows
+    width  = self.width
+    shift  = width - left_offset - piece.width
+    top    = level + piece.height - 1
+    placed = []
+    key, transitions = self.zobrist, self.transitions
+    counted          = row_transitions_for(width)
+    for i, bit_mask in enumerate(piece.bit_masks):
+      row, cells   = rows[top_row + i], bit_mask << shift
+      key         ^= zobrist.row(top - i, cells, width)
+      transitions += counted(row | cells) - counted(row)
+      placed.append(row | cells)
+    self.zobrist, self.transitions = key, transitions
+    self.filled += piece.cells
+    if self.tiles is not None:
+      for i in range(piece.height):
+        self.tiles[top_row + i].place(piece, i, left_offset)
     # Now, post-processing when the row is placed.
-    self._clear_full_rows()
+    self._clear_full_rows(top_row, tuple(placed))
     self._update_stats()
 
   def depth_for_row(self, row_index):
-    height = self.height()
-    for i in range(height):
-      if not self.rows[i].cell_is_empty(row_index):
-        return i
-    return height
+    return len(self.rows) - self.heights[row_index]
+
+  def _render_mask(self, content):
+    return "".join('#' if content & (1 << (self.width - index - 1)) else ' ' for index in range(self.width))
 
   def _prepend_empty_row(self):
-    self.rows.insert(0, Row(self.width))
-
-  def _row_for_bottom(self, piece, left_offset):
-    # We start at -1 and go to the end of rows. We'll stop once we hit a point where we can place.
-    last_row = -1
-    for row_index in range(self.height()):
-      if self._can_place_piece_starting_in(row_index, piece, left_offset):
-        last_row = row_index
-      else:
-        break
-    return last_row
-
-  def _can_place_piece_row_in_board_row(self, row_index, piece, piece_index, left_offset):
-    if row_index < 0: return True
-    return self.rows[row_index].can_place(piece, piece_index, left_offset)
-
-  def _can_place_piece_starting_in(self, row_index, piece, left_offset):
-    # We iterate from the bottom up. Now that row_index is the bottom row.
-    height = piece.height
-    for index in range(height):
-      # We need to convert them around so they hit the correct place.
-      piece_index  = height - index - 1
-      relative_row = row_index - index
-      if not self._can_place_piece_row_in_board_row(relative_row, piece, piece_index, left_offset):
-        return False
-    return True
-
-  def _clear_full_rows(self):
-    original_size = self.height()
-    remove_full    = lambda x: not x.full()
-    self.rows      = list(filter(remove_full, self.rows))
-    final_size     = self.height()
-    if original_size > final_size:
-      self.cleared += (original_size - final_size)
+    self.rows = (0,) + self.rows
+    self.transitions += 2
+    if self.tiles is not None:
+      self.tiles.insert(0, Row(self.width))
+
+  def _landing_level(self, piece, left_offset):
+    # The piece comes to rest on whichever column it hits first, which is the one with
+    # the highest skyline relative to the underside of the piece. We return the level
+    # (counting up from the bottom of the board) of the bottom row of the piece.
+    heights = self.heights
+    bottom  = piece.bottom
+    level   = max(heights[left_offset + i] - bottom[i] for i in range(piece.width))
+    return max(level, 0)
+
+  def _raise_heights(self, piece, left_offset, level):
+    # Only the columns under the piece and their neighbours see their bumpiness or
+    # wells change, so we take those out before raising the columns and add them back after.
+    start, stop = max(left_offset - 1, 0), min(left_offset + piece.width + 1, self.width)
+    heights     = list(self.heights)
+    raised      = 0
+    top         = piece.top
+    bumpiness, wells = surface(heights, start, stop)
+    for i in range(piece.width):
+      column_height = level + top[i] + 1
+      if column_height > heights[left_offset + i]:
+        raised += column_height - heights[left_offset + i]
+        heights[left_offset + i] = column_height
+    after = surface(heights, start, stop)
+    self.bumpiness     += after[0] - bumpiness
+    self.wells         += after[1] - wells
+    self.covered_holes += raised - piece.cells
+    self.heights = tuple(heights)
+
+  def _clear_full_rows(self, top_row, placed):
+    # Only the rows we just placed into can have become full, so we only need
+    # to filter those - everything above and below is shared as is.
+    maximum = self.maximum
+    kept    = tuple(row for row in placed if row != maximum) if maximum in placed else placed
+    rows    = self.rows
+    bottom  = top_row + len(placed)
+    self.rows = rows[:top_row] + kept + rows[bottom:]
+    cleared = len(placed) - len(kept)
+    if cleared:
+      # Full rows have no transitions, so only the filled cells need taking out.
+      self.cleared += cleared
+      self.filled  -= cleared * self.width
+      self._shift_zobrist(rows[:top_row] + placed, rows[:top_row] + kept)
+      bottom_level = len(rows) - bottom
+      self._lower_heights([bottom_level + len(placed) - i - 1 for i, row in enumerate(placed) if row == maximum])
+      if self.tiles is not None:
+        self.tiles[top_row:bottom] = [row for row in self.tiles[top_row:bottom] if not row.full()]
+
+  def _shift_zobrist(self, before, after):
+    # Everything above the lowest cleared row has moved down, so it is rehashed at its
+    # new level. Rows below it keep their level and their keys.
+    width, below = self.width, len(self.rows) - len(after)
+    for index, row in enumerate(before): self.zobrist ^= zobrist.row(below + len(before) - index - 1, row, width)
+    for index, row in enumerate(after):  self.zobrist ^= zobrist.row(below + len(after) - index - 1, row, width)
+
+  def _lower_heights(self, levels):
+    # Every column drops by the number of cleared rows beneath its top. If its top
+    # cell was itself cleared, we walk down from there to the next filled cell.
+    rows    = self.rows
+    height  = len(rows)
+    heights = []
+    for column, column_height in enumerate(self.heights):
+      bit    = 1 << (self.width - column - 1)
+      level  = column_height - sum(1 for cleared_level in levels if cleared_level < column_height)
+      while level > 0 and not rows[height - level] & bit:
+        level -= 1
+      heights.append(level)
+    self.heights                 = tuple(heights)
+    self.bumpiness, self.wells   = surface(heights, 0, self.width)
+    self.covered_holes           = sum(heights) - self.filled
 
   def _update_stats(self):
     current_height = self.height()
     if current_height > self.maximum_height:
       self.maximum_height = current_height
-    self.holes = self.calculated_holes()
+    self.holes = (self.width * current_height) - self.filled
+
+
+# A read only view of the pieces still to come. The underlying sequence is shared by
+# every environment in a game, each of which only keeps its own position in it, so
+# neither forking nor consuming a piece depends on how long the input is.
+class Upcoming(object):
+
+  __slots__ = ['pieces', 'position']
+
+  def __init__(self, pieces, position=0):
+    self.pieces   = pieces
+    self.position = position
+
+  def __len__(self):
+    return max(len(self.pieces) - self.position, 0)
+
+  def __bool__(self):
+    return self.position < len(self.pieces)
+
+  def __getitem__(self, index):
+    if index < 0: index += len(self)
+    if index < 0 or index >= len(self):
+      raise IndexError("upcoming piece index out of range")
+    return self.pieces[self.position + index]
+
+  def __iter__(self):
+    pieces = self.pieces
+    for index in range(self.position, len(pieces)):
+      yield pieces[index]
+
+  def __eq__(self, other):
+    return list(self) == list(other)
+
+  def __repr__(self):
+    return "<Upcoming position=%d remaining=%d>" % (self.position, len(self))
+
+# The pieces for a game read as it is played, rather than all before it starts. Only a
+# window is held - from the position the game has reached (see advance) to lookahead
+# pieces past it - but pieces are indexed by their place in the whole sequence, so the
+# stream stands in for the list an Environment otherwise holds. Its length is the number
+# of pieces read so far, so nothing looks further ahead than the window. A source that
+# runs out is tried again on the next advance, so pieces can be fed in as the game goes.
+class PieceStream(object):
+
+  __slots__ = ['source', 'lookahead', 'window', 'start', 'exhausted']
+
+  def __init__(self, source, lookahead):
+    self.source    = iter(source)
+    self.lookahead = lookahead
+    self.window    = deque()
+    self.start     = 0
+    self.exhausted = False
+    self.advance(0)
+
+  def advance(self, position):
+    "Drops the pieces before position and reads ahead until the window is full again."
+    window = self.window
+    while self.start < position and window:
+      window.popleft()
+      self.start += 1
+    self.exhausted = False
+    while len(window) < self.lookahead:
+      piece = next(self.source, None)
+      if piece is None:
+        self.exhausted = True
+        break
+      window.append(piece)
+
+  def __len__(self):
+    return self.start + len(self.window)
 
+  def __getitem__(self, index):
+    if index < self.start: raise IndexError("piece %d has already been dropped" % index)
+    return self.window[index - self.start]
 
+  def __repr__(self):
+    return "<PieceStream start=%d window=%d exhausted=%r>" % (self.start, len(self.window), self.exhausted)
+
+# Environments are forked for every node the search visits, so forks are copy on
+# write: a fork shares the board, buffer and history of its parent and both sides only take
+# their own copy when they first change it. Only the committed environment (the one
+# the game is actually played on) keeps the board's tiles layer up to date.
 class Environment(object):
 
   class FullBuffer(Exception): pass
 
-  __slots__ = ['configuration', 'buffer', 'board', 'history', 'items', 'current_gen', 'previous_gen']
+  # Whether the environment writes out each placement itself (see StreamingEnvironment).
+  streaming = False
+
+  __slots__ = ['configuration', 'buffer', 'board', '_history', 'pieces', 'position', 'buffer_hash', 'current_gen', 'previous_gen', 'committed', 'shared']
 
   def __init__(self, configuration, items):
     self.configuration = configuration
     self.buffer        = []
-    self.history       = []
-    self.items         = items
+    self.buffer_hash   = 0
+    self._history      = Chain()
+    self.pieces        = items
+    self.position      = 0
     self.board         = Board(configuration.width)
     self.current_gen   = Generation.next()
     self.previous_gen  = None
+    self.committed     = True
+    self.shared        = False
 
   def copy(self):
+    instance               = object.__new__(Environment)
+    instance.configuration = self.configuration
+    instance.buffer        = self.buffer
+    instance.buffer_hash   = self.buffer_hash
+    instance._history      = self._history
+    instance.board         = self.board
+    instance.pieces        = self.pieces
+    instance.position      = self.position
+    instance.previous_gen  = self.current_gen
+    instance.current_gen   = Generation.next()
+    instance.committed     = False
+    instance.shared        = True
+    self.shared            = True
+    return instance
+
+  def detached(self, lookahead):
+    """
+    A copy holding only what a search from here needs - no history, no tiles and at most
+    lookahead of the upcoming pieces - so it is cheap to send to another process.
+    """
     instance               = object.__new__(Environment)
     instance.configuration = self.configuration
     instance.buffer        = list(self.buffer)
-    instance.history       = list(self.history)
-    instance.board         = self.board.copy()
-    instance.items         = list(self.items)
+    instance.buffer_hash   = self.buffer_hash
+    instance._history      = Chain()
+    instance.board         = self.board.copy(tiles=False)
+    instance.pieces        = list(self.items[index] for index in range(min(lookahead, len(self.items))))
+    instance.position      = 0
     instance.previous_gen  = self.current_gen
     instance.current_gen   = Generation.next()
+    instance.committed     = False
+    instance.shared        = False
     return instance
 
   def __repr__(self):
     previous_gen = str(self.previous_gen) if self.previous_gen else '?'
-    return "<Environment gen=%d previous=%s buffer=%d history=%s>" % (self.current_gen, previous_gen, len(self.buffer), len(self.history))
+    return "<Environment gen=%d previous=%s buffer=%d history=%s>" % (self.current_gen, previous_gen, len(self.buffer), len(self._history))
+
+  @property
+  def history(self):
+    return self._history.to_list()
+
+  @property
+  def zobrist(self):
+    "The Zobrist hash of the board, the buffer (as a multiset) and our position in the pieces."
+    return self.board.zobrist ^ self.buffer_hash ^ zobrist.position(self.position)
+
+  @property
+  def items(self):
+    return Upcoming(self.pieces, self.position)
 
   def possible_left_offsets_for(self, piece):
     return range(self.board.width - piece.width + 1)
 
   def perceive(self):
     # When we have no items, we perceive nothing.
-    if not self.items: return None
+    if self.position >= len(self.pieces): return None
     # Otherwise, we perceive the front of the item list.
     return Percept(self.items)
 
   def consume(self):
-    if self.items: self.items.pop(0)
+    if self.position < len(self.pieces): self.position += 1
 
   def buffer_is_full(self):
     return len(self.buffer) == self.configuration.buffer
@@ -262,12 +557,17 @@ class Environment(object):
   def add_to_buffer(self, piece):
     if self.buffer_is_full():
       raise self.FullBuffer("The current environments buffer is already full.")
+    self._unshare()
     self.buffer.append(piece)
+    self.buffer_hash ^= zobrist.buffered(piece.name, self.buffer.count(piece))
 
   def remove_from_buffer(self, piece):
+    self._unshare()
     self.buffer.remove(piece)
+    self.buffer_hash ^= zobrist.buffered(piece.name, self.buffer.count(piece) + 1)
 
   def place_piece_at(self, piece, left_offset):
+    self._unshare()
     self.board.place(piece, left_offset)
 
   def fork(self, action):
@@ -277,5 +577,49 @@ class Environment(object):
     return environment
 
   def update(self, action):
-    self.history.append(action)
-    action.apply(self)
\ No newline at end of file
+    self._history = self._history.append(action)
+    action.apply(self)
+
+  def _unshare(self):
+    # Take our own board and buffer before the first change after a fork. The board copy
+    # itself is cheap as the rows are shared until the next placement replaces them.
+    if self.shared:
+      self.board  = self.board.copy(tiles=self.committed)
+      self.buffer = list(self.buffer)
+      self.shared = False
+
+class StreamingEnvironment(Environment):
+  """
+  The environment a game is played in when its pieces come from a PieceStream. Each
+  placement is written to the output as it is made (flushing every flush_every of them)
+  rather than kept in the history, and the stream moves on past each piece consumed, so
+  memory stays flat however long the game runs. Forks are plain Environments.
+  """
+
+  __slots__ = ['output', 'flush_every', 'unflushed']
+
+  streaming = True
+
+  def __init__(self, configuration, stream, output, flush_every=64):
+    super().__init__(configuration, stream)
+    # The tiles are only there to draw the board, which nothing does from a stream.
+    self.board       = Board(configuration.width, tiles=False)
+    self.output      = output
+    self.flush_every = flush_every
+    self.unflushed   = 0
+
+  def consume(self):
+    super().consume()
+    self.pieces.advance(self.position)
+
+  def update(self, action):
+    action.apply(self)
+    rendered = action.render()
+    if rendered:
+      print(rendered, file=self.output)
+      self.unflushed += 1
+      if self.unflushed >= self.flush_every: self.flush()
+
+  def flush(self):
+    self.output.flush()
+    self.unflushed = 0
@@ -1,4 +1,8 @@
+import mmap
+import os
 from trix.environment import Piece
+from trix.actions import AddToBuffer, PlaceNextPiece, PlaceFromBuffer
+from trix.config import defaults
 
 Pieces = {}
 def addPiece(number, shape): Pieces[number] = Piece(number, shape)
@@ -24,6 +28,50 @@ for name, piece in Pieces.items():
   frequencyWithinPiece = individualOccurences / 4
   Frequencies[piece] = (frequencyWithinPiece * PieceFrequency)
 
+# Placement tables. For a given board width, these lay out every rotation of each piece
+# (in rotation order) along with its width, bottom and top profiles and one action per
+# left offset it fits at. Actions carry no state of their own, so every search node
+# shares the same action objects and generating successors allocates nothing.
+class Rotation(object):
+
+  __slots__ = ['piece', 'width', 'bottom', 'top', 'place_next', 'place_from_buffer']
+
+  def __init__(self, piece, original_piece, board_width):
+    offsets                = range(board_width - piece.width + 1)
+    self.piece             = piece
+    self.width             = piece.width
+    self.bottom            = piece.bottom
+    self.top               = piece.top
+    self.place_next        = tuple(PlaceNextPiece(piece, offset, original_piece) for offset in offsets)
+    self.place_from_buffer = tuple(PlaceFromBuffer(piece, offset, original_piece) for offset in offsets)
+
+class Placements(object):
+
+  __slots__ = ['width', 'rotations', 'place_next', 'place_from_buffer', 'add_to_buffer']
+
+  def __init__(self, width):
+    self.width             = width
+    self.rotations         = {}
+    self.place_next        = {}
+    self.place_from_buffer = {}
+    self.add_to_buffer     = {}
+    for name, piece in Pieces.items():
+      rotations = tuple(Rotation(rotated, piece, width) for rotated in sorted(Rotations[name], key=lambda rotated: rotated.rotation))
+      self.rotations[name]         = rotations
+      self.place_next[name]        = tuple(action for rotation in rotations for action in rotation.place_next)
+      self.place_from_buffer[name] = tuple(action for rotation in rotations for action in rotation.place_from_buffer)
+      self.add_to_buffer[name]     = AddToBuffer(piece)
+
+_placements = {}
+
+def placements_for(width):
+  "The placement tables for a board of the given width, built the first time they're needed."
+  if width not in _placements: _placements[width] = Placements(width)
+  return _placements[width]
+
+# The default board width is what almost every game uses, so build its tables up front.
+placements_for(defaults.width)
+
 # Given a file, reads in the sequence of pieces to be processed for the given game.
 # Note that this will return a list of pieces, normalized according to the game details.
 def readPieces(file):
@@ -32,4 +80,54 @@ def readPieces(file):
     for line in f:
       for character in line:
         if character in Pieces: pieces.append(Pieces[character])
-  return pieces
\ No newline at end of file
+  return pieces
+
+# The pieces for a game as one byte each - the character naming the piece - rather than a
+# list of references to them. Indexing gives back the piece itself, so environments can
+# hold one in place of a list.
+class PieceArray(object):
+
+  __slots__ = ['data']
+
+  # The piece named by each byte value.
+  pieces = [Pieces.get(chr(byte)) for byte in range(256)]
+
+  def __init__(self, data):
+    self.data = data
+
+  def __len__(self):
+    return len(self.data)
+
+  def __getitem__(self, index):
+    return PieceArray.pieces[self.data[index]]
+
+  def __iter__(self):
+    pieces = PieceArray.pieces
+    for byte in self.data: yield pieces[byte]
+
+  def __repr__(self):
+    return "<PieceArray length=%d>" % len(self.data)
+
+# Every byte that doesn't name a piece, to be deleted.
+_not_pieces = bytes(byte for byte in range(256) if PieceArray.pieces[byte] is None)
+
+# Reads the same pieces as readPieces, but maps the file into memory and deletes every
+# byte that doesn't name a piece a chunk at a time with bytes.translate, so only the
+# pieces themselves are ever held and no Python code runs per character.
+def loadPieces(file, chunk=1 << 24):
+  with open(file, 'rb') as f:
+    size = os.fstat(f.fileno()).st_size
+    # Empty files can't be mapped.
+    if not size: return PieceArray(b'')
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+      chunks = [mapped[start:start + chunk].translate(None, _not_pieces) for start in range(0, size, chunk)]
+  return PieceArray(chunks[0] if len(chunks) == 1 else b''.join(chunks))
+
+# Reads the pieces from an open file (or stdin) as they're needed - a line, or a chunk of
+# a long one, at a time - for a game played from a stream (see trix.environment.PieceStream).
+def streamPieces(file, chunk=4096):
+  while True:
+    text = file.readline(chunk)
+    if not text: return
+    for character in text:
+      if character in Pieces: yield Pieces[character]
@@ -0,0 +1,135 @@
+import json
+from bisect import bisect_left
+from time import perf_counter
+from .search import Frontier
+from .utilities import Referee
+
+class Histogram(object):
+  "Counts values into buckets whose upper bounds double from the smallest up, plus one for the rest."
+
+  def __init__(self, smallest=0.001, buckets=16):
+    self.bounds = [smallest * (1 << bucket) for bucket in range(buckets)]
+    self.counts = [0] * (buckets + 1)
+
+  def add(self, value):
+    self.counts[bisect_left(self.bounds, value)] += 1
+
+  def details(self):
+    return {'bounds': self.bounds, 'counts': self.counts}
+
+class Metrics(object):
+  """
+  What the search did for each decision, written to the output as one JSON line per
+  decision and a summary line once the game is over. A decision can place several
+  pieces, or none when it only buffers one, so each line lists the pieces it placed.
+
+  - generated, expanded, pruned and deduplicated: the children created, the nodes whose
+    children were created, the nodes cut off without any and the nodes skipped because
+    the transposition table had already seen their state.
+  - admitted and table_hit_rate: the states the transposition table took in, and the
+    share of its lookups that were duplicates (its hits - deduplicated - over its hits
+    and misses).
+  - branching and frontier_peak: the children per expanded node and the most open nodes.
+  - phases: the seconds spent generating successors, forking environments, scoring
+    boards (which only happens when the history compares them) and in the frontier.
+
+  The summary also has the hits, misses and hit rate of the Referee's score cache over
+  the game.
+
+  Nothing is recorded unless an agent is instrumented with one (see Agent.instrument),
+  which swaps in the metered classes below and in trix.agent, so the search pays nothing
+  for these otherwise.
+  """
+
+  Counts = ('generated', 'expanded', 'pruned', 'deduplicated', 'admitted')
+  Phases = ('successors', 'fork', 'score', 'queue')
+
+  def __init__(self, output):
+    self.opened    = isinstance(output, str)
+    self.output    = open(output, 'w') if self.opened else output
+    self.decisions = 0
+    self.placed    = 0
+    self.latency   = Histogram()
+    self.totals    = dict.fromkeys(('seconds', 'visited') + self.Counts + self.Phases, 0)
+    self.peak      = 0
+    self.scored    = (Referee.cache.hits, Referee.cache.misses)
+    self.start()
+
+  def start(self):
+    "Starts recording the next decision."
+    self.generated     = 0
+    self.expanded      = 0
+    self.pruned        = 0
+    self.deduplicated  = 0
+    self.admitted      = 0
+    self.frontier_peak = 0
+    self.phases        = dict.fromkeys(self.Phases, 0.0)
+    self.started       = perf_counter()
+
+  def finish(self, placed, visited):
+    "Writes out the decision, given the names of the pieces it placed and the nodes visited for it."
+    seconds = perf_counter() - self.started
+    record  = {'decision': self.decisions, 'placed': placed, 'seconds': seconds, 'visited': visited}
+    for name in self.Counts: record[name] = getattr(self, name)
+    record['table_hit_rate'] = rate(self.deduplicated, self.admitted)
+    record['branching']      = self.generated / self.expanded if self.expanded else 0.0
+    record['frontier_peak']  = self.frontier_peak
+    record['phases']         = self.phases
+    self.write(record)
+    totals = self.totals
+    for name in ('seconds', 'visited') + self.Counts: totals[name] += record[name]
+    for name, elapsed in self.phases.items(): totals[name] += elapsed
+    self.peak       = max(self.peak, self.frontier_peak)
+    self.decisions += 1
+    self.placed    += len(placed)
+    self.latency.add(seconds)
+
+  def summary(self):
+    totals = self.totals
+    record = {'summary': True, 'decisions': self.decisions, 'placed': self.placed}
+    for name in ('seconds', 'visited') + self.Counts: record[name] = totals[name]
+    record['table_hit_rate'] = rate(totals['deduplicated'], totals['admitted'])
+    record['branching']      = totals['generated'] / totals['expanded'] if totals['expanded'] else 0.0
+    record['frontier_peak']  = self.peak
+    record['phases']         = {name: totals[name] for name in self.Phases}
+    record['latency']        = self.latency.details()
+    hits, misses             = Referee.cache.hits - self.scored[0], Referee.cache.misses - self.scored[1]
+    record['scores']         = {'hits': hits, 'misses': misses, 'hit_rate': rate(hits, misses)}
+    return record
+
+  def close(self):
+    self.write(self.summary())
+    if self.opened: self.output.close()
+
+  def write(self, record):
+    print(json.dumps(record), file=self.output)
+
+def rate(hits, misses):
+  return hits / (hits + misses) if hits or misses else 0.0
+
+class MeteredFrontier(Frontier):
+  "Wraps a frontier, timing each push and pop and keeping track of its peak size."
+
+  def __init__(self, frontier, metrics):
+    self.frontier = frontier
+    self.metrics  = metrics
+
+  def push(self, priority, node):
+    started = perf_counter()
+    self.frontier.push(priority, node)
+    metrics = self.metrics
+    metrics.phases['queue'] += perf_counter() - started
+    size = len(self.frontier)
+    if size > metrics.frontier_peak: metrics.frontier_peak = size
+
+  def pop(self):
+    started = perf_counter()
+    node    = self.frontier.pop()
+    self.metrics.phases['queue'] += perf_counter() - started
+    return node
+
+  def __len__(self):
+    return len(self.frontier)
+
+  def __iter__(self):
+    return iter(self.frontier)
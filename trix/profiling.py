@@ -0,0 +1,157 @@
+# Profiles whatever runs inside a Profiler, writing three files next to each other:
+#
+# - <prefix>.pstats, cProfile's statistics, for pstats or snakeviz.
+# - <prefix>.folded, stacks sampled every interval of CPU time in the collapsed format
+#   flamegraph.pl and speedscope read, one "outer;...;inner count" line per stack.
+# - <prefix>.memory, the peak memory traced by tracemalloc and the functions (such as
+#   Board.copy or Variation.fork) that had allocated it at the time.
+#
+# All three run at once, so everything runs a few times slower than it otherwise would.
+# The proportions are what to go by.
+
+import cProfile
+import os
+import signal
+import tracemalloc
+from collections import Counter
+
+def label(code):
+  return "%s:%s" % (os.path.basename(code.co_filename), getattr(code, 'co_qualname', code.co_name))
+
+class StackSampler(object):
+  """
+  Counts the stacks running whenever the process has used another interval of CPU time,
+  calling sampled() (if given) every so many samples.
+  """
+
+  available = hasattr(signal, 'setitimer') and hasattr(signal, 'SIGPROF')
+
+  def __init__(self, interval=0.001, sampled=None, every=100):
+    self.interval = interval
+    self.sampled  = sampled
+    self.every    = every
+    self.samples  = 0
+    self.busy     = False
+    self.stacks   = Counter()
+
+  def start(self):
+    if not self.available: return
+    self.previous = signal.signal(signal.SIGPROF, self.sample)
+    signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+  def stop(self):
+    if not self.available: return
+    signal.setitimer(signal.ITIMER_PROF, 0, 0)
+    # A signal still on its way is ignored rather than left to the default, which exits.
+    signal.signal(signal.SIGPROF, signal.SIG_IGN)
+    signal.signal(signal.SIGPROF, self.previous)
+
+  def sample(self, signum, frame):
+    # The handler can be interrupted by the next signal, which is dropped.
+    if self.busy: return
+    self.busy = True
+    try:
+      stack = []
+      while frame is not None:
+        stack.append(label(frame.f_code))
+        frame = frame.f_back
+      self.stacks[";".join(reversed(stack))] += 1
+      self.samples += 1
+      if self.sampled and self.samples % self.every == 0: self.sampled()
+    finally:
+      self.busy = False
+
+  def collapsed(self):
+    return "".join("%s %d\n" % (stack, count) for stack, count in self.stacks.most_common())
+
+class MemoryPeak(object):
+  """
+  Follows the memory traced by tracemalloc, taking a snapshot whenever it grows by more
+  than the given margin past the last one, so the last snapshot is from close to the peak.
+  Each allocation is put down to the function that made it.
+  """
+
+  def __init__(self, margin=0.25, frames=1):
+    self.margin    = margin
+    self.frames    = frames
+    self.snapshot  = None
+    self.size      = 0
+    self.functions = {}
+
+  def start(self):
+    tracemalloc.start(self.frames)
+
+  def check(self):
+    current, peak = tracemalloc.get_traced_memory()
+    if current > self.size * (1 + self.margin):
+      self.snapshot = tracemalloc.take_snapshot()
+      self.size     = current
+
+  def stop(self):
+    self.check()
+    self.peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+  def function_at(self, filename, lineno):
+    "The qualified name of the function defined at the line of the file, if it can be found."
+    lines = self.functions.get(filename)
+    if lines is None:
+      lines = self.functions[filename] = {}
+      try:
+        with open(filename) as f: code = compile(f.read(), filename, 'exec')
+      except (OSError, SyntaxError, ValueError):
+        code = None
+      pending = [code] if code else []
+      while pending:
+        code = pending.pop()
+        name = getattr(code, 'co_qualname', code.co_name)
+        for start, end, line in code.co_lines():
+          if line is not None: lines[line] = name
+        pending.extend(constant for constant in code.co_consts if hasattr(constant, 'co_lines'))
+    return lines.get(lineno, '<module>')
+
+  def sites(self):
+    "(size, count, site) for each function holding memory in the snapshot, largest first."
+    totals = Counter()
+    counts = Counter()
+    if self.snapshot is not None:
+      # Leaving out what tracemalloc and the profiler hold themselves.
+      snapshot = self.snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)])
+      for statistic in snapshot.statistics('lineno'):
+        frame = statistic.traceback[0]
+        site  = "%s:%s" % (os.path.basename(frame.filename), self.function_at(frame.filename, frame.lineno))
+        totals[site] += statistic.size
+        counts[site] += statistic.count
+    return [(size, counts[site], site) for site, size in totals.most_common()]
+
+  def report(self, limit=40):
+    lines = ["Peak traced memory: %.1f KiB" % (self.peak / 1024),
+             "Held at the last snapshot, %.1f KiB, by function:" % (self.size / 1024),
+             "%12s %10s  %s" % ('KiB', 'blocks', 'site')]
+    for size, count, site in self.sites()[:limit]:
+      lines.append("%12.1f %10d  %s" % (size / 1024, count, site))
+    return "\n".join(lines) + "\n"
+
+class Profiler(object):
+  "Profiles the code run inside it (as a context manager), writing the files described above."
+
+  def __init__(self, prefix, interval=0.001):
+    self.prefix  = prefix
+    self.profile = cProfile.Profile()
+    self.memory  = MemoryPeak()
+    self.sampler = StackSampler(interval, sampled=self.memory.check)
+
+  def __enter__(self):
+    self.memory.start()
+    self.sampler.start()
+    self.profile.enable()
+    return self
+
+  def __exit__(self, *exception):
+    self.profile.disable()
+    self.sampler.stop()
+    self.memory.stop()
+    self.profile.dump_stats(self.prefix + '.pstats')
+    with open(self.prefix + '.folded', 'w') as f: f.write(self.sampler.collapsed())
+    with open(self.prefix + '.memory', 'w') as f: f.write(self.memory.report())
+    return False
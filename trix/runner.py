@@ -1,7 +1,13 @@
 import argparse
+import sys
+from contextlib import contextmanager
 from .config import defaults, Configuration
-from .environment import Environment
-from .game import readPieces
+from .environment import Environment, PieceStream, StreamingEnvironment
+from .game import loadPieces, streamPieces
+from .metrics import Metrics
+from .profiling import Profiler
+from .search import TranspositionTable, ValidFrontiers, ValidSearches
+from .utilities import Referee
 import trix.agent
 
 parser = argparse.ArgumentParser(description="Trix configuration information")
@@ -9,6 +15,23 @@ parser.add_argument('-c', '--config', dest='config_file', help='A configuration
 parser.add_argument('-a', '--agent', dest='agent', help='The name of the agent ot use', nargs='?', default=defaults.agent, type=str, choices=trix.agent.ValidAgents)
 parser.add_argument('-w', '--width', dest='width', help='The width of the tetrist board', default=defaults.width, type=int)
 parser.add_argument('-b', '--buffer', dest='buffer', help='The size of the buffer', default=defaults.buffer, type=int)
+parser.add_argument('--table-size', dest='table_size', help='The number of states the search transposition table holds (0 disables it)', default=defaults.table_size, type=int)
+parser.add_argument('--table-policy', dest='table_policy', help='How the transposition table evicts states when full', default=defaults.table_policy, choices=TranspositionTable.policies)
+parser.add_argument('--score-cache', dest='score_cache', help='The number of board scores kept for reuse (0 disables it)', default=defaults.score_cache, type=int)
+parser.add_argument('--vectorize', dest='vectorize', help='Score placements in batches with NumPy when it is installed', default=defaults.vectorize, action=argparse.BooleanOptionalAction)
+parser.add_argument('--search', dest='search', help='The search the search agent runs for each decision', default=defaults.search, choices=ValidSearches)
+parser.add_argument('--ceiling', dest='ceiling', help='The most nodes the ida search holds in memory at once', default=defaults.ceiling, type=int)
+parser.add_argument('--reuse', dest='reuse', help='Start each search from what the last one found under the actions taken since', default=defaults.reuse, action=argparse.BooleanOptionalAction)
+parser.add_argument('--nodes', dest='nodes', help='The most nodes the search and bfs agents expand for each decision', default=defaults.nodes, type=int)
+parser.add_argument('--time-per-piece', dest='time_per_piece', help='The most seconds the search agent takes for each decision, searching deeper until then (instead of --nodes)', default=defaults.time_per_piece, type=float)
+parser.add_argument('--time-budget', dest='time_budget', help='The most seconds the search agent takes for the whole game, shared out between the pieces left', default=defaults.time_budget, type=float)
+parser.add_argument('-j', '--jobs', dest='jobs', help='The number of processes the search agent splits each decision between', default=defaults.jobs, type=int)
+parser.add_argument('--frontier', dest='frontier', help='The queue the search keeps its open nodes in', default=defaults.frontier, choices=ValidFrontiers)
+parser.add_argument('--beam-width', dest='beam_width', help='The number of variations the beam agent keeps at each depth', default=defaults.beam_width, type=int)
+parser.add_argument('--beam-depth', dest='beam_depth', help='The number of actions the beam agent looks ahead', default=defaults.beam_depth, type=int)
+parser.add_argument('--metrics', dest='metrics', help='A file to write what the search did for each decision to, as JSON lines', default=defaults.metrics)
+parser.add_argument('--profile', dest='profile', help='Profile the game, writing the results to files starting with this (see trix.profiling)', default=defaults.profile)
+parser.add_argument('--stream', dest='stream', help='Read the pieces as the game goes, writing out each move as it is made ("-" reads stdin or writes stdout)', default=defaults.stream, action='store_true')
 parser.add_argument('input_file', help='The file to read input from')
 parser.add_argument('output_file', help='The file to write output to')
 
@@ -16,12 +39,52 @@ def main(argv):
     parsed_arguments = parser.parse_args(argv[1:])
     configuration = Configuration()
     configuration.merge(parsed_arguments)
+    play(configuration)
+
+# Plays the game in configuration.input_file, writing the moves to configuration.output_file,
+# and returns the agent that played it.
+def play(configuration):
+    Referee.cache.resize(configuration.score_cache)
+    if configuration.stream:
+        with opened(configuration.input_file, 'r', sys.stdin) as source, opened(configuration.output_file, 'w', sys.stdout) as output:
+            pieces      = PieceStream(streamPieces(source), lookahead_for(configuration))
+            environment = StreamingEnvironment(configuration, pieces, output)
+            agent       = play_in(environment)
+            environment.flush()
+            return agent
     # Now, build the environment.
-    pieces      = readPieces(configuration.input_file)
+    pieces      = loadPieces(configuration.input_file)
     environment = Environment(configuration, pieces)
-    agent_type  = trix.agent.from_name(configuration.agent)
-    agent       = agent_type(environment)
-    agent.run()
+    return play_in(environment)
+
+# Plays the game in the environment, returning the agent that played it.
+def play_in(environment):
+    configuration = environment.configuration
+    agent_type    = trix.agent.from_name(configuration.agent)
+    agent         = agent_type(environment)
+    if configuration.metrics: agent.instrument(Metrics(configuration.metrics))
+    if configuration.profile:
+        with Profiler(configuration.profile): agent.run()
+    else:
+        agent.run()
+    if agent.metrics is not None: agent.metrics.close()
+    return agent
+
+# The most pieces past the current one any agent looks at when streaming: the pieces it
+# could buffer plus as many as it could place in the actions it looks ahead (see
+# MinimalSearchAgent.find_variation and the beam depth), and one more to tell whether
+# there is anything left to buffer for.
+def lookahead_for(configuration):
+    buffer = configuration.buffer
+    return buffer + max(buffer * 2, 3, configuration.beam_depth) + 1
+
+# Opens the file, or uses the standard stream for "-".
+@contextmanager
+def opened(path, mode, standard):
+    if path == '-':
+        yield standard
+    else:
+        with open(path, mode) as f: yield f
 
 if __name__ == '__main__':
   import sys
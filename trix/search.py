@@ -1,4 +1,11 @@
-from queue import PriorityQueue, Empty
+from collections import OrderedDict, deque
+from heapq import heappush, heappop
+from itertools import count, islice
+from math import inf
+from queue import Empty
+from time import perf_counter
+import multiprocessing
+import traceback
 
 class Node(object):
 
@@ -10,17 +17,170 @@ class Node(object):
 
   def heuristic_value(self): return 0
 
+  # Nodes that return a key are checked against the transposition table (when the
+  # search has one) so the same state reached by a different path is only expanded
+  # again when the new path is cheaper according to path_cost().
+  def state_key(self): return None
+  def path_cost(self): return self.cost
+
   def visit(self): pass
 
   def is_terminal(self):  return False
   def is_goal(self): return False
   def children(self):     return []
 
+  # The child at the index in children(). Nodes that can make it without making the
+  # ones before it should, as HDAStar rebuilds the nodes it's sent this way.
+  def child(self, index): return next(islice(self.children(), index, None))
+
+class TranspositionTable(object):
+  """
+  A bounded record of the states a search has expanded, mapping each state key to the
+  lowest path cost it was expanded with. When full, entries are evicted according to
+  the policy - 'lru' drops the least recently seen state, 'fifo' the oldest one.
+  """
+
+  class UnknownPolicy(Exception): pass
+
+  policies = ('lru', 'fifo')
+
+  def __init__(self, capacity=50000, policy='lru'):
+    if policy not in self.policies:
+      raise self.UnknownPolicy("Unknown eviction policy %r, expected one of %s" % (policy, ", ".join(self.policies)))
+    self.capacity  = capacity
+    self.policy    = policy
+    self.entries   = OrderedDict()
+    self.hits      = 0
+    self.misses    = 0
+    self.evictions = 0
+
+  def __len__(self):
+    return len(self.entries)
+
+  def clear(self):
+    self.entries.clear()
+
+  def admit(self, key, cost):
+    "Records the state, returning False when it was already expanded at the same or a lower cost."
+    entries = self.entries
+    known   = entries.get(key)
+    if known is not None:
+      if self.policy == 'lru': entries.move_to_end(key)
+      if known <= cost:
+        self.hits += 1
+        return False
+    else:
+      if len(entries) >= self.capacity:
+        entries.popitem(last=False)
+        self.evictions += 1
+    self.misses += 1
+    entries[key] = cost
+    return True
+
+  def hit_rate(self):
+    total = self.hits + self.misses
+    return (self.hits / total) if total else 0.0
+
+  def details(self):
+    return "Table: %d hits, %d misses, %d evictions, %d entries" % (self.hits, self.misses, self.evictions, len(self.entries))
+
+# Frontiers hold the open nodes for a best-first search, handing back the node with
+# the lowest priority first. Nodes with equal priorities come back in the order they
+# were added, so nodes themselves never need to be compared.
+class Frontier(object):
+
+  def push(self, priority, node):
+    raise NotImplementedError("You must implement push() in your frontier.")
+
+  def pop(self):
+    raise NotImplementedError("You must implement pop() in your frontier.")
+
+  def __len__(self):
+    raise NotImplementedError("You must implement __len__() in your frontier.")
+
+  def __iter__(self):
+    "(priority, node) for each node, in the order they would be popped."
+    raise NotImplementedError("You must implement __iter__() in your frontier.")
+
+class HeapFrontier(Frontier):
+  "A binary heap, with an insertion counter to break ties. Works for any priorities."
+
+  def __init__(self):
+    self.heap    = []
+    self.counter = count()
+
+  def push(self, priority, node):
+    heappush(self.heap, (priority, next(self.counter), node))
+
+  def pop(self):
+    if self.heap: return heappop(self.heap)[2]
+    return None
+
+  def __len__(self):
+    return len(self.heap)
+
+  def __iter__(self):
+    for priority, counter, node in sorted(self.heap, key=lambda entry: entry[:2]):
+      yield priority, node
+
+class BucketFrontier(Frontier):
+  """
+  A bucket queue for the small integer priorities our searches produce: one FIFO
+  bucket per distinct priority, plus a heap of the priorities that currently have
+  a bucket. Pushing to an existing bucket and popping from the lowest one never
+  touches the heap.
+  """
+
+  def __init__(self):
+    self.buckets    = {}
+    self.priorities = []
+    self.size       = 0
+
+  def push(self, priority, node):
+    bucket = self.buckets.get(priority)
+    if bucket is None:
+      bucket = self.buckets[priority] = deque()
+      heappush(self.priorities, priority)
+    bucket.append(node)
+    self.size += 1
+
+  def pop(self):
+    if not self.size: return None
+    priority = self.priorities[0]
+    bucket   = self.buckets[priority]
+    node     = bucket.popleft()
+    if not bucket:
+      heappop(self.priorities)
+      del self.buckets[priority]
+    self.size -= 1
+    return node
+
+  def __len__(self):
+    return self.size
+
+  def __iter__(self):
+    for priority in sorted(self.buckets):
+      for node in self.buckets[priority]: yield priority, node
+
+Frontiers = {
+  'heap':   HeapFrontier,
+  'bucket': BucketFrontier
+}
+ValidFrontiers = Frontiers.keys()
+
 class GeneralSearch(object):
 
-  def __init__(self, root):
+  def __init__(self, root, table=None):
     self.root = root
+    self.table = table
     self.maximum = 200
+    # When a list, every node visited but not expanded - as a duplicate or because it
+    # was terminal - is put in it, so a later search can pick up where this one left off.
+    self.set_aside = None
+    # When set, the perf_counter() time the search gives up at, leaving expired set. The
+    # root is always expanded, whatever the time.
+    self.deadline  = None
+    self.expired   = False
 
   def next_candidate(self):
     raise NotImplementedError("You must implement next_candidate() in your search.")
@@ -28,35 +188,350 @@ class GeneralSearch(object):
   def append_node(self, node):
     raise NotImplementedError("You must implement append_node() in your search.")
 
+  def is_duplicate(self, node):
+    # True when we've already expanded this state from a path at least as good.
+    table = self.table
+    if table is None: return False
+    key = node.state_key()
+    return key is not None and not table.admit(key, node.path_cost())
+
   def search(self):
     node = self.next_candidate()
     maximum = self.maximum
     visited = 0
+    set_aside = self.set_aside
+    deadline  = self.deadline
     while not node is None and visited <= maximum:
+      if deadline is not None and visited and perf_counter() >= deadline:
+        self.expired = True
+        break
+      if self.is_duplicate(node):
+        if set_aside is not None: set_aside.append(node)
+        node = self.next_candidate()
+        continue
       visited += 1
       node.visit()
       if node.is_goal(): return node
       # Now, append all of the child nodes.
       if not node.is_terminal():
         for child in node.children(): self.append_node(child)
+      elif set_aside is not None:
+        set_aside.append(node)
       node = self.next_candidate()
+    # The node taken when the budget ran out was never looked at.
+    if node is not None and set_aside is not None: set_aside.append(node)
     # Otherwise, return None to signify nothing was found.
     return None
 
 class AStar(GeneralSearch):
 
-  def __init__(self, root):
-    super().__init__(root)
-    self.priority_queue = PriorityQueue()
-    self.priority_queue.put((0, root))
+  def __init__(self, root, table=None, frontier=HeapFrontier):
+    super().__init__(root, table)
+    self.frontier = frontier()
+    self.frontier.push(0, root)
 
   def append_node(self, node):
-    pair = (node.estimated_cost(), node)
-    self.priority_queue.put(pair)
+    self.frontier.push(node.estimated_cost(), node)
 
   def next_candidate(self):
-    if self.priority_queue.empty():
+    return self.frontier.pop()
+
+class IDAStar(GeneralSearch):
+  """
+  Iterative deepening A*: a depth first search that only follows nodes whose estimated
+  cost is within a bound, raising the bound to the lowest estimate that went over it
+  each time round. Only the current path and the children still waiting on it are held
+  in memory, and the ceiling is a hard limit on how many of those there can be - a node
+  whose children would take us over it is treated as a leaf instead.
+  """
+
+  def __init__(self, root, table=None, ceiling=10000):
+    super().__init__(root, table)
+    self.ceiling   = ceiling
+    self.visited   = 0
+    self.peak      = 0
+    self.truncated = 0
+
+  def search(self):
+    bound = self.root.cost
+    while bound is not None and self.visited <= self.maximum and not self.expired:
+      # Costs in the table are only comparable within a single pass.
+      if self.table is not None: self.table.clear()
+      result, bound = self.bounded_search(bound)
+      if result is not None: return result
+    return None
+
+  def bounded_search(self, bound):
+    "Returns the goal found within the bound (if any) and the bound for the next pass."
+    next_bound = None
+    # Each entry holds the children of a node on the current path still to be searched,
+    # best last so we can pop them off.
+    stack = [[self.root]]
+    live  = 1
+    while stack:
+      siblings = stack[-1]
+      if not siblings:
+        stack.pop()
+        continue
+      node  = siblings.pop()
+      live -= 1
+      if self.visited > self.maximum: return None, None
+      if self.deadline is not None and self.visited and perf_counter() >= self.deadline:
+        self.expired = True
+        return None, None
+      if self.is_duplicate(node): continue
+      self.visited += 1
+      node.visit()
+      if node.is_goal(): return node, None
+      if node.is_terminal(): continue
+      children = []
+      for child in node.children():
+        estimate = child.estimated_cost()
+        if estimate <= bound:
+          children.append((estimate, child))
+        elif next_bound is None or estimate < next_bound:
+          next_bound = estimate
+      if live + len(children) > self.ceiling:
+        self.truncated += 1
+        continue
+      children.sort(key=lambda pair: pair[0])
+      stack.append([child for estimate, child in reversed(children)])
+      live += len(children)
+      self.peak = max(self.peak, live)
+    return None, next_bound
+
+# More than any search's maximum, in a shared signed 64 bit counter.
+Unlimited = (1 << 63) - 1
+
+class HDAStar(object):
+  """
+  Hash distributed A*: a best-first search shared between worker processes, each of which
+  owns the states whose key hashes to it. Only the owner of a state expands it, so every
+  state is only checked against one worker's transposition table and the work spreads by
+  state rather than by subtree.
+
+  Finding a node's key means generating its state, which is most of the cost of visiting
+  it, so children start out in the frontier of the worker that generated them. A worker
+  only works out who owns a node when it comes off its frontier, sending it on to its
+  owner's frontier if that's someone else.
+
+  Nodes can't be sent between processes themselves, so each worker holds its own copy of
+  the root and nodes travel as paths - the index of each child in children() on the way
+  down from it. The owner rebuilds a node it's sent from the root, one child() at a time,
+  and holds on to nothing but its frontier: nodes are dropped once expanded. Keys need to hash the same way in every process. Ints do, and the
+  Zobrist keys states hash to are mixed from the state alone (see trix.zobrist), so
+  every worker agrees on who owns a state. The workers share three counters:
+
+  - pending, the number of nodes not yet finished with anywhere, whether they're waiting
+    in a frontier or on their way to one. Children are counted before the node they came
+    from is done with, so it only reaches 0 once the whole search space is exhausted.
+  - expanded, the number of nodes expanded, which no search takes beyond its maximum.
+  - best, the priority of the best goal found so far. Nodes that can't beat it are dropped.
+
+  The workers are started once and serve one search at a time, each reporting the best
+  goal it found and, if a report function is given, what report(root) returns in it.
+  A worker that fails ends the search for all of them, and search() raises WorkerFailed
+  with its traceback. So does one that dies without a word (killed, say), after which the
+  workers are started afresh for the next search.
+  """
+
+  class WorkerFailed(Exception): pass
+
+  # How often (in seconds) search() checks on the workers while it waits for them.
+  poll = 1
+
+  def __init__(self, jobs=2, table_size=50000, table_policy='lru', frontier=HeapFrontier, report=None):
+    self.context  = context = multiprocessing.get_context()
+    self.jobs     = jobs
+    self.settings = (table_size, table_policy, frontier, report)
+    self.pending  = context.Value('q', 0)
+    self.expanded = context.Value('q', 0)
+    self.best     = context.Value('d', inf)
+    self.searches = count(1)
+    self.workers  = []
+    self.start()
+
+  def start(self):
+    context       = self.context
+    self.inboxes  = [context.Queue() for job in range(self.jobs)]
+    self.results  = context.Queue()
+    for job in range(self.jobs):
+      worker  = HDAWorker(job, self.inboxes, self.results, self.pending, self.expanded, self.best, *self.settings)
+      process = context.Process(target=worker.run, daemon=True)
+      process.start()
+      self.workers.append(process)
+
+  def search(self, root, maximum=200):
+    "Returns the path to the best goal found (or None) and the report from each worker."
+    if not self.workers: self.start()
+    search = next(self.searches)
+    self.pending.value  = 1
+    self.expanded.value = 0
+    self.best.value     = inf
+    for inbox in self.inboxes: inbox.put(('search', search, root, maximum))
+    self.inboxes[0].put(('node', search, 0, ()))
+    goals, reports, failures = [], [], []
+    for goal, report, failure in self.collect():
+      if failure is not None: failures.append(failure)
+      if goal is not None: goals.append(goal)
+      reports.append(report)
+    if failures: raise self.WorkerFailed("An HDA* worker failed:\n" + failures[0])
+    best = min(goals, key=lambda goal: (goal[0], len(goal[1]))) if goals else None
+    return (best[1] if best else None), reports
+
+  def collect(self):
+    # Every worker reports once per search, unless it dies first. Then the others are told
+    # the search is over and stopped, and new workers take their place next time.
+    results = []
+    while len(results) < self.jobs:
+      try:
+        results.append(self.results.get(timeout=self.poll))
+      except Empty:
+        dead = [worker for worker in self.workers if not worker.is_alive()]
+        if not dead: continue
+        with self.expanded.get_lock(): self.expanded.value = Unlimited
+        self.close()
+        raise self.WorkerFailed("An HDA* worker died with exit code %s" % dead[0].exitcode)
+    return results
+
+  def close(self, timeout=5):
+    for inbox in self.inboxes: inbox.put(('stop',))
+    for worker in self.workers:
+      worker.join(timeout)
+      if worker.is_alive(): worker.terminate()
+    for inbox in self.inboxes: inbox.cancel_join_thread()
+    self.workers = []
+
+class HDAWorker(object):
+  "One of the processes of an HDAStar search - see there."
+
+  def __init__(self, index, inboxes, results, pending, expanded, best, table_size, table_policy, frontier, report):
+    self.index    = index
+    self.inboxes  = inboxes
+    self.results  = results
+    self.pending  = pending
+    self.expanded = expanded
+    self.best     = best
+    self.table    = TranspositionTable(table_size, table_policy) if table_size > 0 else None
+    self.frontier = frontier
+    self.report   = report
+    self.current  = 0
+    self.root     = None
+    self.early    = []
+
+  def run(self):
+    inbox = self.inboxes[self.index]
+    # Anything still on its way to another worker when we stop is flushed as we exit.
+    # Leaving it behind could leave that worker's inbox locked with the stop unsent.
+    while True:
+      try:
+        message = inbox.get()
+        if message[0] == 'stop': return
+        if message[0] == 'search': self.search(*message[1:])
+        # Nodes can overtake the search they belong to, in which case they wait for it.
+        if message[0] == 'node' and message[1] > self.current: self.early.append(message)
+      except Exception:
+        self.fail(traceback.format_exc())
+
+  def fail(self, failure):
+    # Every other worker stops at the expanded count, so the search is over for all of
+    # them, and the parent hears of the failure along with their results.
+    with self.expanded.get_lock(): self.expanded.value = Unlimited
+    self.wake()
+    self.root = self.open = None
+    self.results.put((None, None, failure))
+
+  def search(self, search, root, maximum):
+    self.current = search
+    self.root    = root
+    self.open    = self.frontier()
+    if self.table is not None: self.table.clear()
+    for message in self.early: self.accept(message)
+    self.early = []
+    goal, inbox = None, self.inboxes[self.index]
+    while self.expanded.value <= maximum:
+      self.receive(inbox, block=not len(self.open))
+      if not len(self.open):
+        if self.pending.value == 0: break
+        continue
+      # Nodes sent here are ours, and come without the node itself.
+      priority, path, node = self.open.pop()
+      if node is None:
+        node = self.node_at(path)
+      else:
+        owner = self.owner(node)
+        if owner != self.index:
+          self.inboxes[owner].put(('node', search, priority, path))
+          continue
+      children = self.expand(node, priority, maximum)
+      if children is None:
+        if goal is None or priority < goal[0]: goal = (priority, path)
+        children = ()
+      self.finish(path, children)
+    self.results.put((goal, self.report(root) if self.report else None, None))
+    self.root = self.open = None
+
+  def receive(self, inbox, block):
+    try:
+      message = inbox.get(timeout=0.05) if block else inbox.get_nowait()
+      while True:
+        if message[0] == 'node': self.accept(message)
+        message = inbox.get_nowait()
+    except Empty:
+      pass
+
+  def accept(self, message):
+    kind, search, priority, path = message
+    if search == self.current: self.open.push(priority, (priority, path, None))
+
+  def owner(self, node):
+    key = node.state_key()
+    return self.index if key is None else hash(key) % len(self.inboxes)
+
+  def expand(self, node, priority, maximum):
+    "Returns the children of the node (as (priority, child) pairs), or None when it's a goal."
+    if priority >= self.best.value or self.is_duplicate(node): return ()
+    with self.expanded.get_lock():
+      if self.expanded.value > maximum: return ()
+      self.expanded.value += 1
+      exhausted = self.expanded.value > maximum
+    if exhausted: self.wake()
+    node.visit()
+    if node.is_goal():
+      with self.best.get_lock():
+        if priority < self.best.value: self.best.value = priority
       return None
-    else:
-      pair = self.priority_queue.get(False)
-      return pair[1]
\ No newline at end of file
+    if node.is_terminal(): return ()
+    return [(child.estimated_cost(), child) for child in node.children()]
+
+  def finish(self, path, children):
+    # The node is done with and its children take its place, in one step, so pending
+    # never drops to 0 while there is still work out there.
+    with self.pending.get_lock():
+      self.pending.value += len(children) - 1
+      finished = self.pending.value == 0
+    if finished: self.wake()
+    for index, (priority, child) in enumerate(children):
+      self.open.push(priority, (priority, path + (index,), child))
+
+  def wake(self):
+    # Idle workers only notice the search is over when they next hear from their inbox.
+    for index, inbox in enumerate(self.inboxes):
+      if index != self.index: inbox.put(('wake',))
+
+  def node_at(self, path):
+    node = self.root
+    for index in path: node = node.child(index)
+    return node
+
+  def is_duplicate(self, node):
+    table = self.table
+    if table is None: return False
+    key = node.state_key()
+    return key is not None and not table.admit(key, node.path_cost())
+
+Searches = {
+  'astar': AStar,
+  'ida':   IDAStar
+}
+ValidSearches = Searches.keys()
@@ -0,0 +1,223 @@
+# Serves games over a socket, so a game server can drive trix move by move without paying
+# for a new process, the imports and the placement tables each time. Each connection is a
+# game of its own, held warm between requests in a process of its own. A request is a line
+# of pieces (as in the input files); the reply is a line for each placement made in the
+# existing output format (see render_piece_and_offset), then "ok" and how long the request
+# took in milliseconds. A piece that is buffered gets no placement until it comes out of
+# the buffer.
+#
+# A few other requests are understood:
+#
+# - stats, for a JSON line of the latencies across the server and for this game, with
+#   the game's board and how often its process's score cache was hit.
+# - end, once there are no more pieces to come, to place the ones still in the buffer.
+# - reset, to start a new game on the same connection.
+# - quit, to close the connection.
+#
+# The searches are pure Python, so on threads games would only take turns under the GIL.
+# Each game's process is forked from the server, with the imports and tables already in
+# place, and --workers of them search at once.
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from .config import defaults, Configuration
+from .environment import PieceStream, StreamingEnvironment
+from .game import Pieces
+from .metrics import Histogram
+from .runner import lookahead_for
+from .utilities import Referee
+import trix.agent
+
+parser = argparse.ArgumentParser(description="Serves games of trix over a socket")
+parser.add_argument('--host', dest='host', help='The address to listen on', default='127.0.0.1')
+parser.add_argument('--port', dest='port', help='The port to listen on', default=7411, type=int)
+parser.add_argument('--unix', dest='unix', help='Listen on a unix socket at this path instead')
+parser.add_argument('--workers', dest='workers', help='The number of games searching at once', default=os.cpu_count(), type=int)
+parser.add_argument('-a', '--agent', dest='agent', help='The name of the agent to use', default=defaults.agent, choices=trix.agent.ValidAgents)
+parser.add_argument('-w', '--width', dest='width', help='The width of the board', default=defaults.width, type=int)
+parser.add_argument('-b', '--buffer', dest='buffer', help='The size of the buffer', default=defaults.buffer, type=int)
+parser.add_argument('--nodes', dest='nodes', help='The most nodes the search agent expands for each decision', default=defaults.nodes, type=int)
+parser.add_argument('--time-per-piece', dest='time_per_piece', help='The most seconds the search agent takes for each decision', default=defaults.time_per_piece, type=float)
+
+class Latency(object):
+  "The number, total, worst and spread (as a Histogram) of request latencies, in seconds."
+
+  def __init__(self):
+    self.count     = 0
+    self.total     = 0.0
+    self.maximum   = 0.0
+    self.histogram = Histogram()
+
+  def add(self, seconds):
+    self.count  += 1
+    self.total  += seconds
+    self.maximum = max(self.maximum, seconds)
+    self.histogram.add(seconds)
+
+  def details(self):
+    return {'requests': self.count, 'mean': self.total / self.count if self.count else 0.0,
+            'max': self.maximum, 'latency': self.histogram.details()}
+
+class Feed(object):
+  "The pieces sent for a game and not read yet, as a source for its PieceStream."
+
+  __slots__ = ['pending']
+
+  def __init__(self):
+    self.pending = deque()
+
+  def __iter__(self):
+    return self
+
+  def __next__(self):
+    if not self.pending: raise StopIteration
+    return self.pending.popleft()
+
+class Session(object):
+  "A game played a request at a time, in a StreamingEnvironment fed with the pieces sent."
+
+  def __init__(self, configuration):
+    self.configuration = configuration
+    self.feed          = Feed()
+    self.output        = io.StringIO()
+    self.environment   = StreamingEnvironment(configuration, PieceStream(self.feed, lookahead_for(configuration)), self.output)
+    self.agent         = trix.agent.from_name(configuration.agent)(self.environment)
+
+  def play(self, pieces):
+    "Plays every piece sent so far, returning the placements made."
+    environment = self.environment
+    self.feed.pending.extend(pieces)
+    environment.pieces.advance(environment.position)
+    percept = environment.perceive()
+    while percept:
+      if self.agent.take_turn(percept) is None: break
+      percept = environment.perceive()
+    return self.moves()
+
+  def end(self):
+    "Places the pieces left in the buffer, as there are no more to come, returning the placements made."
+    while self.environment.buffer:
+      if self.agent.take_turn(None) is None: break
+    return self.moves()
+
+  def moves(self):
+    moves = self.output.getvalue().splitlines()
+    self.output.seek(0)
+    self.output.truncate()
+    return moves
+
+  def details(self):
+    board, cache = self.environment.board, Referee.cache
+    scores       = {'hits': cache.hits, 'misses': cache.misses, 'hit_rate': cache.hit_rate()}
+    return {'pieces': self.environment.position, 'height': board.height(), 'cleared': board.cleared, 'scores': scores}
+
+  def close(self):
+    self.agent.close()
+
+# The session played in this process, when it's one of the server's game processes.
+_session = None
+
+def open_session(configuration):
+  global _session
+  if _session is not None: _session.close()
+  _session = Session(configuration)
+
+def in_session(method, *arguments):
+  return getattr(_session, method)(*arguments)
+
+class Server(object):
+
+  def __init__(self, configuration, workers=None):
+    self.configuration = configuration
+    self.searching     = asyncio.Semaphore(workers or os.cpu_count())
+    self.latency       = Latency()
+    self.sessions      = 0
+
+  async def serve(self, reader, writer):
+    "Plays a game with the connection, until it quits or goes away."
+    loop    = asyncio.get_running_loop()
+    game    = ProcessPoolExecutor(1, initializer=open_session, initargs=(self.configuration,))
+    latency = Latency()
+    self.sessions += 1
+
+    async def call(method, *arguments):
+      async with self.searching:
+        return await loop.run_in_executor(game, in_session, method, *arguments)
+
+    try:
+      while True:
+        line = await reader.readline()
+        if not line: break
+        request = line.decode('ascii', 'replace').strip()
+        if request == 'quit': break
+        started = perf_counter()
+        try:
+          if request == 'stats':
+            details = latency.details()
+            details.update(await loop.run_in_executor(game, in_session, 'details'))
+            reply   = [json.dumps({'server': self.details(), 'session': details})]
+          elif request == 'end':
+            reply = await call('end')
+          elif request == 'reset':
+            await loop.run_in_executor(game, open_session, self.configuration)
+            latency, reply = Latency(), []
+          else:
+            reply = await call('play', pieces_in(request))
+        except Exception as error:
+          writer.write(("error %s\n" % error).encode())
+        else:
+          elapsed = perf_counter() - started
+          self.latency.add(elapsed)
+          latency.add(elapsed)
+          writer.write("".join("%s\n" % move for move in reply).encode() + b"ok %.3f\n" % (elapsed * 1000))
+        await writer.drain()
+    finally:
+      self.sessions -= 1
+      game.submit(in_session, 'close')
+      game.shutdown(wait=False)
+      writer.close()
+
+  def details(self):
+    details = self.latency.details()
+    details.update(sessions=self.sessions)
+    return details
+
+  async def listen(self, host=None, port=None, unix=None):
+    "Starts listening for connections, returning the asyncio server doing so."
+    if unix: return await asyncio.start_unix_server(self.serve, path=unix)
+    return await asyncio.start_server(self.serve, host, port)
+
+def pieces_in(request):
+  pieces = [Pieces[character] for character in request if character in Pieces]
+  if not pieces: raise ValueError("expected pieces, stats, end, reset or quit, got %r" % request)
+  return pieces
+
+def configuration_from(arguments):
+  configuration = Configuration()
+  configuration.merge(defaults)
+  for name in ('agent', 'width', 'buffer', 'nodes', 'time_per_piece'): setattr(configuration, name, getattr(arguments, name))
+  return configuration
+
+async def run(arguments):
+  server    = Server(configuration_from(arguments), arguments.workers)
+  listening = await server.listen(arguments.host, arguments.port, arguments.unix)
+  where     = arguments.unix or "%s:%d" % (arguments.host, arguments.port)
+  print("Serving trix on %s" % where, file=sys.stderr)
+  async with listening: await listening.serve_forever()
+
+def main(argv):
+  arguments = parser.parse_args(argv[1:])
+  try:
+    asyncio.run(run(arguments))
+  except KeyboardInterrupt:
+    pass
+
+if __name__ == '__main__':
+  main(sys.argv)
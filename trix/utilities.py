@@ -1,19 +1,93 @@
+from collections import OrderedDict
+from .chain import Chain
+
+class ScoreCache(object):
+  """
+  A bounded record of Referee scores by board fingerprint, so a board reached by different
+  paths - or again by a later search - is only scored once. When full, the least recently
+  used score is evicted. A capacity of 0 disables it.
+  """
+
+  def __init__(self, capacity=50000):
+    self.capacity  = capacity
+    self.entries   = OrderedDict()
+    self.hits      = 0
+    self.misses    = 0
+    self.evictions = 0
+
+  def __len__(self):
+    return len(self.entries)
+
+  def clear(self):
+    self.entries.clear()
+
+  def resize(self, capacity):
+    self.capacity = capacity
+    while len(self.entries) > max(capacity, 0):
+      self.entries.popitem(last=False)
+      self.evictions += 1
+
+  def score(self, board, calculate):
+    "The score for the board, calling calculate(board) when it isn't known yet."
+    entries = self.entries
+    key     = board.fingerprint()
+    score   = entries.get(key)
+    if score is not None:
+      # Searches in other threads (see trix.server) can evict it in the meantime.
+      try:
+        entries.move_to_end(key)
+      except KeyError:
+        pass
+      self.hits += 1
+      return score
+    self.misses += 1
+    score = calculate(board)
+    if len(entries) >= self.capacity:
+      try:
+        entries.popitem(last=False)
+        self.evictions += 1
+      except KeyError:
+        pass
+    entries[key] = score
+    return score
+
+  def hit_rate(self):
+    total = self.hits + self.misses
+    return (self.hits / total) if total else 0.0
+
+  def details(self):
+    return "Scores: %d hits, %d misses, %d evictions, %d entries" % (self.hits, self.misses, self.evictions, len(self.entries))
+
 class Referee(object):
   """
   Given a board object, gives an approximate score representing the quality of the given
   board. Note that a lower score is better, and to that end we use positive and negative
   weighting.
+
+  Scores are shared through a process wide cache (see ScoreCache), which needs clearing
+  if the weights are changed.
   """
 
+  cache = ScoreCache()
+
   @classmethod
   def calculate(klass, board):
+    if klass.cache.capacity > 0:
+      return klass.cache.score(board, klass.uncached)
+    return klass.uncached(board)
+
+  @classmethod
+  def uncached(klass, board):
     return klass(board).score()
 
   __slots__ = ['board', 'environment']
 
   weights = {
-    'valleys':       -0.5,
+    'valleys':        1.0,
     'holes':          2.0,
+    'covered_holes':  2.0,
+    'bumpiness':      0.5,
+    'transitions':    0.5,
     'cleared':       -2.5,
     'maximum_height': 2.0
   }
@@ -22,7 +96,7 @@ class Referee(object):
     self.board = board
 
   def score(self):
-    return sum(self.factor(name) for name in self.weights.keys())
+    return sum(weight * getattr(self, name)() for name, weight in self.weights.items())
 
   def factor(self, name):
     return self.weights[name] * getattr(self, name)()
@@ -30,7 +104,10 @@ class Referee(object):
   def cleared(self):        return self.board.cleared
   def maximum_height(self): return self.board.maximum_height
   def holes(self):          return self.board.holes
-  def valleys(self): return 0
+  def covered_holes(self):  return self.board.covered_holes
+  def valleys(self):        return self.board.wells
+  def bumpiness(self):      return self.board.bumpiness
+  def transitions(self):    return self.board.transitions
 
 class CutoffMetric(object):
 
@@ -38,25 +115,29 @@ class CutoffMetric(object):
 
 class Variation(object):
 
-  __slots__ = ['environment', 'depth', 'actions', '_utility', 'height', 'number_of_actions']
+  __slots__ = ['environment', 'depth', 'chain', '_utility', 'height', 'number_of_actions']
 
   def __init__(self, environment, depth, actions):
+    if not isinstance(actions, Chain): actions = Chain.from_list(actions)
     self.environment       = environment
     self.depth             = depth
-    self.actions           = actions
+    self.chain             = actions
     self.number_of_actions = len(actions)
     self.height            = environment.board.height()
     self._utility          = None
 
   def fork(self, action):
-    return Variation(self.environment.fork(action), self.depth + 1, self.actions + [action])
+    return Variation(self.environment.fork(action), self.depth + 1, self.chain.append(action))
+
+  @property
+  def actions(self): return self.chain.to_list()
 
   @property
-  def root_action(self): return self.actions[0]
+  def root_action(self): return self.chain.first()
 
   @property
   def priority_score(self):
-    return (self.number_of_actions, -self.utility)
+    return (self.number_of_actions, self.utility)
 
 
   @property
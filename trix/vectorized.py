@@ -0,0 +1,150 @@
+# Batch evaluation of placements with NumPy. Given a board and a piece, this works out
+# where every rotation and offset of the piece lands and the Referee features of the
+# board that results - all at once, as arrays - without forking an environment for
+# any of them. NumPy is optional: when it isn't installed, available() is False and
+# callers score candidates one fork at a time instead.
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+from .game import placements_for
+from .utilities import Referee
+
+# Rows are held as int64 masks, which leaves room for boards up to this wide.
+MaximumWidth = 62
+# Pads the skyline for the columns a narrow piece doesn't cover, so they never win.
+Floor = -(1 << 20)
+
+def available(width=None):
+  return numpy is not None and (width is None or width <= MaximumWidth)
+
+class PlacementBatch(object):
+  "Arrays describing every placement of one piece, in the same order as its placement tables."
+
+  __slots__ = ['columns', 'bottom', 'top', 'masks', 'heights', 'cells']
+
+  def __init__(self, rotations, width):
+    columns, bottom, top, masks, heights, cells = [], [], [], [], [], []
+    for rotation in rotations:
+      piece = rotation.piece
+      for offset in range(len(rotation.place_next)):
+        shift = width - offset - piece.width
+        padding = 4 - piece.width
+        columns.append([offset + i for i in range(piece.width)] + [width] * padding)
+        bottom.append(list(piece.bottom) + [0] * padding)
+        top.append(list(piece.top) + [0] * padding)
+        # The piece's rows from the bottom up, shifted into place on the board.
+        masks.append([bit_mask << shift for bit_mask in reversed(piece.bit_masks)] + [0] * (4 - piece.height))
+        heights.append(piece.height)
+        cells.append(piece.cells)
+    self.columns = numpy.array(columns, dtype=numpy.int64)
+    self.bottom  = numpy.array(bottom, dtype=numpy.int64)
+    self.top     = numpy.array(top, dtype=numpy.int64)
+    self.masks   = numpy.array(masks, dtype=numpy.int64)
+    self.heights = numpy.array(heights, dtype=numpy.int64)
+    self.cells   = numpy.array(cells, dtype=numpy.int64)
+
+_batches = {}
+
+def batch_for(width, name):
+  key = (width, name)
+  if key not in _batches: _batches[key] = PlacementBatch(placements_for(width).rotations[name], width)
+  return _batches[key]
+
+def features(board, name):
+  "The Referee features (by factor name) of the board after each placement of the named piece."
+  batch   = batch_for(board.width, name)
+  width   = board.width
+  height  = board.height()
+  # Where each placement lands: the highest skyline under the piece, relative to its underside.
+  skyline = numpy.array(board.heights + (Floor,), dtype=numpy.int64)
+  landing = numpy.maximum((skyline[batch.columns] - batch.bottom).max(axis=1), 0)
+  # The board rows each placement covers (bottom up), with the piece added to them.
+  rows     = numpy.zeros(height + 4, dtype=numpy.int64)
+  if height: rows[:height] = board.rows[::-1]
+  window   = landing[:, None] + numpy.arange(4)
+  before   = rows[window]
+  covered  = before | batch.masks
+  full     = covered == board.maximum
+  cleared  = full.sum(axis=1)
+  top      = numpy.maximum(height, landing + batch.heights)
+  after    = top - cleared
+  filled   = board.filled + batch.cells - (width * cleared)
+  # Only the covered rows change their transitions; full rows have none and rows above
+  # the board (before the piece reaches them) don't exist.
+  transitions = board.transitions \
+    + numpy.where(window < top[:, None], _row_transitions(covered, width), 0).sum(axis=1) \
+    - numpy.where(window < height, _row_transitions(before, width), 0).sum(axis=1)
+  columns = _column_heights(board, batch, landing, covered, full, cleared)
+  return {
+    'landing':        landing,
+    'valleys':        _wells(columns),
+    'holes':          (width * after) - filled,
+    'covered_holes':  columns.sum(axis=1) - filled,
+    'bumpiness':      numpy.abs(numpy.diff(columns, axis=1)).sum(axis=1),
+    'transitions':    transitions,
+    'cleared':        board.cleared + cleared,
+    'maximum_height': numpy.maximum(board.maximum_height, after)
+  }
+
+def _popcount(values):
+  # The usual SWAR popcount, for versions of NumPy without bitwise_count. Masks are
+  # never negative, so the arithmetic shifts behave.
+  values = values - ((values >> 1) & 0x5555555555555555)
+  values = (values & 0x3333333333333333) + ((values >> 2) & 0x3333333333333333)
+  values = (values + (values >> 4)) & 0x0F0F0F0F0F0F0F0F
+  return (values * 0x0101010101010101) >> 56
+
+if numpy is not None and hasattr(numpy, 'bitwise_count'):
+  popcount = numpy.bitwise_count
+else:
+  popcount = _popcount
+
+def _row_transitions(rows, width):
+  # As trix.environment.row_transitions, with the walls handled separately so that
+  # the widest boards still fit in an int64.
+  inside = popcount((rows ^ (rows >> 1)) & ((1 << (width - 1)) - 1))
+  return inside.astype(numpy.int64) + ((~rows >> (width - 1)) & 1) + (~rows & 1)
+
+def _column_heights(board, batch, landing, covered, full, cleared):
+  # The skyline after each placement, once its full rows are cleared. Columns whose top
+  # is above the covered rows just drop by the number cleared. For the rest, the top is
+  # the highest filled cell left in the covered rows, or failing that, the top of the
+  # column beneath them on the board.
+  width, height, count = board.width, board.height(), len(landing)
+  raised = numpy.zeros((count, width + 1), dtype=numpy.int64)
+  raised[numpy.arange(count)[:, None], batch.columns] = landing[:, None] + batch.top + 1
+  placed = numpy.maximum(numpy.array(board.heights + (0,), dtype=numpy.int64), raised)[:, :width]
+  shifts = numpy.arange(width - 1, -1, -1, dtype=numpy.int64)
+  bits   = ((covered[:, :, None] >> shifts) & 1).astype(bool) & ~full[:, :, None]
+  levels = landing[:, None] + numpy.arange(1, 5) - (numpy.cumsum(full, axis=1) - full)
+  inside = numpy.where(bits, levels[:, :, None], 0).max(axis=1)
+  below  = _heights_below(board, shifts)[landing]
+  return numpy.where(placed > landing[:, None] + 4, placed - cleared[:, None], numpy.maximum(inside, below))
+
+def _heights_below(board, shifts):
+  # The height of each column counting only the rows beneath each level.
+  height = board.height()
+  table  = numpy.zeros((height + 1, board.width), dtype=numpy.int64)
+  if height:
+    rows  = numpy.array(board.rows[::-1], dtype=numpy.int64)
+    bits  = ((rows[:, None] >> shifts) & 1).astype(bool)
+    table[1:] = numpy.maximum.accumulate(numpy.where(bits, numpy.arange(1, height + 1)[:, None], 0), axis=0)
+  return table
+
+def _wells(columns):
+  # The wells trix.environment.surface counts (the Referee's valleys), over the whole
+  # skyline of each placement.
+  if columns.shape[1] == 1: return numpy.zeros(len(columns), dtype=numpy.int64)
+  rim          = numpy.empty_like(columns)
+  rim[:, 0]    = columns[:, 1]
+  rim[:, -1]   = columns[:, -2]
+  rim[:, 1:-1] = numpy.minimum(columns[:, :-2], columns[:, 2:])
+  return numpy.maximum(rim - columns, 0).sum(axis=1)
+
+def scores(board, name):
+  "The Referee score of the board after each placement of the named piece."
+  values = features(board, name)
+  return sum(weight * values[factor] for factor, weight in Referee.weights.items())
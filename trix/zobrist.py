@@ -0,0 +1,58 @@
+# Keys for Zobrist hashing the search state. Every cell on the board (by level, counting
+# up from the bottom, and column), every (piece, count) entry in the buffer and every
+# position in the piece sequence gets its own random 64 bit key. A state hashes to the
+# xor of the keys for everything in it, so a change to the state only has to xor out
+# and in the keys that changed.
+#
+# Each key is mixed from what it is the key for (with splitmix64), so it is the same
+# whatever order keys are asked for in - in every run and in every process, which the
+# hash distributed search relies on to agree on who owns a state. The tables only cache
+# the cell and buffer keys, as those are asked for all the time.
+
+import threading
+
+_Mask    = 0xFFFFFFFFFFFFFFFF
+_cells   = []
+_buffer  = {}
+_growing = threading.Lock()
+
+def _mix(value):
+  value = (value + 0x9E3779B97F4A7C15) & _Mask
+  value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _Mask
+  value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _Mask
+  return value ^ (value >> 31)
+
+# The mix is one to one, so keys differ as long as what goes in does. Cells and buffer
+# entries are tagged in the top bits, out of the way of positions. Each key is mixed from
+# the length of its row as it goes on the end, so rows only grow one thread at a time.
+def _grow(level, column):
+  with _growing:
+    while len(_cells) <= level: _cells.append([])
+    keys = _cells[level]
+    while len(keys) <= column: keys.append(_mix(1 << 63 | level << 32 | len(keys)))
+
+def cell(level, column):
+  try:
+    return _cells[level][column]
+  except IndexError:
+    _grow(level, column)
+    return _cells[level][column]
+
+def row(level, content, width):
+  "The xor of the keys for every filled cell in a row mask at the given level."
+  key = 0
+  while content:
+    lowest   = content & -content
+    key     ^= cell(level, width - lowest.bit_length())
+    content ^= lowest
+  return key
+
+def buffered(name, count):
+  "The key for holding at least count copies of the named piece in the buffer."
+  key = (name, count)
+  if key not in _buffer: _buffer[key] = _mix(1 << 62 | int.from_bytes(name.encode(), 'big') << 24 | count)
+  return _buffer[key]
+
+def position(index):
+  # Positions are unbounded, so rather than a table we mix the index.
+  return _mix(index)